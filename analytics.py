@@ -0,0 +1,153 @@
+import os
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+import datamanager
+from calculations import BMI_CATEGORIES, DEFAULT_TDEE_GOAL, calculate_bmi_batch
+
+# Offline population reports: daily average intake, the share of users over their
+# TDEE goal, and the BMI category distribution per month. Users are read in chunks
+# by a process pool; each worker opens its own read-only view of the store and
+# returns small per-date count tables that are summed in the parent, so memory is
+# bounded by the chunk size rather than the number of users.
+ANALYTICS_CHUNK_SIZE = 500
+DAILY_COUNT_COLUMNS = ['users_logged', 'total_intake', 'users_over_goal']
+
+_reader = None
+
+
+def _open_reader(backend, path):
+    """One read-only backend per worker process, kept for all the chunks it handles."""
+    global _reader
+    if backend == "pickle":
+        # Read-only (never repairs the journal the app is appending to), one resident user.
+        _reader = datamanager.PickleBackend(path, max_resident=1, read_only=True)
+    elif backend == "sqlite":
+        _reader = datamanager.SQLiteBackend(path)
+    elif backend == "columnar":
+        _reader = datamanager.ColumnarSnapshot(path)
+    else:
+        raise ValueError(f"Unknown storage backend: {backend!r}")
+
+def _load_chunk(usernames):
+    """Concatenated food and weight rows of a chunk of users, with a per-user code column."""
+    food = {'user': [], 'Date': [], 'Calories': []}
+    weight = {'user': [], 'Date': [], 'Weight': [], 'TDEE': []}
+    heights = []
+    for code, username in enumerate(usernames):
+        food_log = _reader.get_food_log(username)
+        bmi_history = _reader.get_bmi_history(username)
+        heights.append(_reader.get_profile(username)['height'])
+        _reader.release(username)
+        food['user'].append(np.full(len(food_log), code, dtype='int32'))
+        weight['user'].append(np.full(len(bmi_history), code, dtype='int32'))
+        for column in ('Date', 'Calories'):
+            food[column].append(food_log[column].to_numpy())
+        for column in ('Date', 'Weight', 'TDEE'):
+            weight[column].append(bmi_history[column].to_numpy())
+    # Build each frame once per chunk; per-user frames would dominate the run time.
+    food = pd.DataFrame({column: np.concatenate(arrays) for column, arrays in food.items()})
+    weight = pd.DataFrame({column: np.concatenate(arrays) for column, arrays in weight.items()})
+    food['Date'] = pd.to_datetime(food['Date'], format='%Y-%m-%d')
+    weight['Date'] = pd.to_datetime(weight['Date'], format='%Y-%m-%d')
+    return food, weight, np.asarray(heights, dtype=float)
+
+def _take_rows(table, positions):
+    """Rows of a columnar table for the users at `positions`, plus each row's index into `positions`."""
+    columns = _reader.scan(table)
+    offsets = columns.pop('offsets')
+    starts, lengths = offsets[positions], offsets[positions + 1] - offsets[positions]
+    owner = np.repeat(np.arange(len(positions), dtype='int32'), lengths)
+    rows = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return owner, {name: column[rows] for name, column in columns.items()}
+
+def _load_columnar_chunk(usernames):
+    """_load_chunk for a columnar snapshot: one gather per column, no per-user objects."""
+    positions = np.array([_reader.position(username) for username in usernames], dtype='int64')
+    owner, food_columns = _take_rows('food', positions)
+    food = pd.DataFrame({'user': owner, 'Date': food_columns['date'].astype('datetime64[D]'),
+                         'Calories': food_columns['calories']})
+    owner, bmi_columns = _take_rows('bmi', positions)
+    weight = pd.DataFrame({'user': owner, 'Date': bmi_columns['date'].astype('datetime64[D]'),
+                           'Weight': bmi_columns['weight'], 'TDEE': bmi_columns['tdee']})
+    heights = [_reader.get_profile(username)['height'] for username in usernames]
+    return food, weight, np.asarray(heights, dtype=float)
+
+def _daily_counts(food, weight):
+    """Per date: users with intake, their summed intake, and how many of them went over goal.
+
+    Matches DailyCalorieTotals: each day's intake is compared with the latest non-zero
+    TDEE the user logged on or before that day, or DEFAULT_TDEE_GOAL if there is none.
+    """
+    intake = food.groupby(['user', 'Date'], sort=False)['Calories'].sum().reset_index()
+    intake = intake[intake['Calories'] > 0].sort_values('Date')
+    goals = weight.loc[weight['TDEE'] > 0, ['user', 'Date', 'TDEE']].sort_values('Date')
+    # An empty Date column (no weigh-ins in the chunk) parses to a different resolution.
+    goals['Date'] = goals['Date'].astype(intake['Date'].dtype)
+    status = pd.merge_asof(intake, goals, on='Date', by='user', direction='backward')
+    status['over'] = status['Calories'] > status['TDEE'].fillna(DEFAULT_TDEE_GOAL)
+    counts = status.groupby('Date').agg(users_logged=('user', 'size'), total_intake=('Calories', 'sum'),
+                                        users_over_goal=('over', 'sum'))
+    return counts.astype('int64')
+
+def _bmi_counts(weight, heights):
+    """Per month and BMI category, the number of users whose last weigh-in that month falls in it."""
+    month = weight['Date'].dt.to_period('M')
+    last = weight.assign(Month=month).sort_values('Date').groupby(['user', 'Month'], sort=False).tail(1)
+    _, codes = calculate_bmi_batch(heights[last['user'].values], last['Weight'].values)
+    categories = pd.Categorical.from_codes(codes, BMI_CATEGORIES)
+    return pd.crosstab(last['Month'].values, categories, dropna=False).rename_axis(index='Month', columns=None)
+
+def _aggregate_chunk(usernames):
+    load = _load_columnar_chunk if isinstance(_reader, datamanager.ColumnarSnapshot) else _load_chunk
+    food, weight, heights = load(usernames)
+    return _daily_counts(food, weight), _bmi_counts(weight, heights)
+
+def _chunks(usernames, chunk_size):
+    for i in range(0, len(usernames), chunk_size):
+        yield usernames[i:i + chunk_size]
+
+def run_analytics(backend=None, path=None, workers=None, chunk_size=ANALYTICS_CHUNK_SIZE):
+    """Aggregates every user in the store and returns (daily intake frame, BMI category frame)."""
+    backend = backend or datamanager.STORAGE_BACKEND
+    path = path or {"pickle": datamanager.DATA_FILE, "sqlite": datamanager.SQLITE_FILE,
+                    "columnar": datamanager.COLUMNAR_FILE}.get(backend)
+    _open_reader(backend, path)
+    usernames = _reader.list_users()
+
+    daily = pd.DataFrame(columns=DAILY_COUNT_COLUMNS, dtype='int64')
+    bmi = pd.DataFrame(columns=BMI_CATEGORIES, dtype='int64')
+    with multiprocessing.Pool(workers, initializer=_open_reader, initargs=(backend, path)) as pool:
+        for daily_part, bmi_part in pool.imap_unordered(_aggregate_chunk, _chunks(usernames, chunk_size)):
+            daily = daily.add(daily_part, fill_value=0)
+            bmi = bmi.add(bmi_part, fill_value=0)
+
+    daily = daily.sort_index().astype('int64')
+    users = daily['users_logged'].replace(0, np.nan)
+    daily_report = pd.DataFrame({
+        'Date': daily.index.strftime('%Y-%m-%d') if len(daily) else [],
+        'Users Logged': daily['users_logged'].values,
+        'Average Intake': (daily['total_intake'] / users).round(1).values,
+        'Share Over Goal': (daily['users_over_goal'] / users).round(4).values,
+    })
+    bmi = bmi.reindex(columns=BMI_CATEGORIES, fill_value=0).sort_index().astype('int64')
+    bmi_report = bmi.div(bmi.sum(axis=1).replace(0, np.nan), axis=0).round(4)
+    bmi_report = bmi.add_suffix(' Users').join(bmi_report.add_suffix(' Share'))
+    bmi_report.index = bmi_report.index.astype(str)
+    return daily_report, bmi_report.rename_axis('Month').reset_index()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate intake and BMI statistics over all users.")
+    parser.add_argument("--backend", choices=["pickle", "sqlite", "columnar"], default=datamanager.STORAGE_BACKEND)
+    parser.add_argument("--source", help="Snapshot or database to read (default: the app's data file).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--chunk-size", type=int, default=ANALYTICS_CHUNK_SIZE, help="Users per work item.")
+    parser.add_argument("--output-dir", default="analytics_reports", help="Folder for the summary CSV files.")
+    args = parser.parse_args()
+
+    daily_report, bmi_report = run_analytics(args.backend, args.source, args.workers, args.chunk_size)
+    os.makedirs(args.output_dir, exist_ok=True)
+    daily_report.to_csv(os.path.join(args.output_dir, "daily_intake.csv"), index=False)
+    bmi_report.to_csv(os.path.join(args.output_dir, "bmi_categories.csv"), index=False)
+    print(f"Wrote {len(daily_report)} days and {len(bmi_report)} months of statistics to {args.output_dir}/.")
@@ -0,0 +1,53 @@
+import argparse
+import json
+import shutil
+import tempfile
+from benchmarks import setup_offline
+
+# Usage: python -m benchmarks --users 1000 --days 730 --output results.json [--compare old.json]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the health app handlers and storage on a synthetic population.")
+    parser.add_argument("--users", type=int, default=1000, help="Synthetic users to generate.")
+    parser.add_argument("--days", type=int, default=365, help="Maximum days of history per user.")
+    parser.add_argument("--backend", choices=["pickle", "sqlite"], default="pickle")
+    parser.add_argument("--calls", type=int, default=200, help="Timed calls per handler.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of save_data/load_data.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads in the concurrency scenario (0 to skip).")
+    parser.add_argument("--ops-per-thread", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="Folder for the generated data (default: a temporary folder, removed afterwards).")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Earlier results file to check for latency regressions.")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="healthapp-bench-")
+    setup_offline(data_dir.rstrip("/") + "/", args.backend)
+    from benchmarks.runner import run_benchmarks, save_results, compare
+
+    config = {
+        'users': args.users, 'days': args.days, 'backend': args.backend, 'calls': args.calls,
+        'repeat': args.repeat, 'threads': args.threads, 'ops_per_thread': args.ops_per_thread,
+        'seed': args.seed,
+    }
+    try:
+        results = run_benchmarks(config)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    save_results(results, args.output)
+
+    for name, result in results['results'].items():
+        latency = result.get('latency_ms')
+        if latency:
+            print(f"{name:36s} p50 {latency['p50']:9.3f} ms   p99 {latency['p99']:9.3f} ms   max {latency['max']:9.3f} ms")
+        else:
+            print(f"{name:36s} {result['total_seconds']:.3f} s")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results)
+        for name, key, old, new in regressions:
+            print(f"REGRESSION {name} {key}: {old:.3f} ms -> {new:.3f} ms")
+        if not regressions:
+            print(f"No latency regressions against {args.compare}.")
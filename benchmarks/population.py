@@ -0,0 +1,119 @@
+import os
+import datetime
+import pickle
+import numpy as np
+import pandas as pd
+import datamanager
+from healthlog import FoodLog, BMIHistory, EPOCH_ORDINAL, days_to_dates
+from calculations import calculate_bmi_batch, calculate_tdee_batch, ACTIVITY_MULTIPLIERS
+
+# Every synthetic user logs in with this password.
+BENCHMARK_PASSWORD = "benchmark"
+
+# Typical single servings: (name, calories). Logged calories vary around these.
+FOODS = [
+    ("Oatmeal", 150), ("Scrambled Eggs", 200), ("Greek Yogurt", 130), ("Banana", 105),
+    ("Apple", 95), ("Orange Juice", 110), ("Coffee with Milk", 40), ("Toast with Butter", 180),
+    ("Chicken Salad", 350), ("Turkey Sandwich", 420), ("Rice Bowl", 480), ("Pasta Bolognese", 650),
+    ("Cheeseburger", 550), ("Margherita Pizza Slice", 280), ("Sushi Roll", 300), ("Lentil Soup", 230),
+    ("Grilled Salmon", 410), ("Steak and Potatoes", 750), ("Vegetable Stir Fry", 320), ("Burrito", 680),
+    ("Protein Bar", 210), ("Almonds", 170), ("Chocolate Bar", 230), ("Potato Chips", 160),
+    ("Ice Cream", 270), ("Soda", 150), ("Beer", 155), ("Glass of Wine", 125),
+]
+FOOD_NAMES = np.array([name for name, _ in FOODS], dtype=object)
+FOOD_CALORIES = np.array([calories for _, calories in FOODS], dtype=float)
+
+
+def _profile(rng):
+    gender = "Male" if rng.random() < 0.5 else "Female"
+    height = rng.normal(176 if gender == "Male" else 163, 7)
+    return {
+        'height': round(float(np.clip(height, 140, 210)), 1),
+        'weight': round(float(np.clip(rng.normal(80 if gender == "Male" else 67, 14), 40, 180)), 1),
+        'age': int(rng.integers(18, 81)),
+        'gender': gender,
+        'activity_level': str(rng.choice(list(ACTIVITY_MULTIPLIERS))),
+    }
+
+def generate_user(rng, max_days, end_day, foods_per_day=3.0, weigh_in_rate=0.3):
+    """Builds one user's (profile, food log frame, BMI history frame).
+
+    Each user has logged for between one day and `max_days` days up to `end_day`
+    (a healthlog day number): a Poisson number of meals per day and a weigh-in on
+    roughly `weigh_in_rate` of days, following a slow random walk. The profile weight
+    is the latest weigh-in, as update_bmi would leave it.
+    """
+    profile = _profile(rng)
+    n_days = int(rng.integers(1, max_days + 1))
+    days = np.arange(end_day - n_days + 1, end_day + 1, dtype='int32')
+
+    meal_days = np.repeat(days, rng.poisson(foods_per_day, n_days))
+    choice = rng.integers(0, len(FOODS), len(meal_days))
+    calories = np.maximum(FOOD_CALORIES[choice] * rng.normal(1, 0.15, len(meal_days)), 0).round()
+    food_log = pd.DataFrame({'Date': days_to_dates(meal_days), 'Food': FOOD_NAMES[choice],
+                             'Calories': calories.astype(int)}, columns=FoodLog.COLUMNS)
+
+    weighed = rng.random(n_days) < weigh_in_rate
+    weighed[-1] = True
+    walk = profile['weight'] + np.cumsum(rng.normal(0, 0.15, n_days))
+    weights = np.clip(walk, 35, 200).round(1)[weighed]
+    profile['weight'] = float(weights[-1])
+    n = len(weights)
+    bmi, _ = calculate_bmi_batch(np.full(n, profile['height']), weights)
+    _, tdee = calculate_tdee_batch(np.full(n, profile['age']), np.full(n, profile['gender'], dtype=object),
+                                   np.full(n, profile['height']), weights,
+                                   np.full(n, profile['activity_level'], dtype=object))
+    bmi_history = pd.DataFrame({'Date': days_to_dates(days[weighed]), 'BMI': np.round(bmi, 1),
+                                'Weight': weights, 'TDEE': tdee.astype(int)}, columns=BMIHistory.COLUMNS)
+    return profile, food_log, bmi_history
+
+def generate_population(users, max_days=365, seed=0, end_date=None, **kwargs):
+    """Yields (username, profile, food log frame, BMI history frame) for `users` users.
+
+    Users are generated one at a time, so arbitrarily large populations can be streamed
+    to disk. The same seed always produces the same population.
+    """
+    rng = np.random.default_rng(seed)
+    end_day = (end_date or datetime.date.today()).toordinal() - EPOCH_ORDINAL
+    for i in range(users):
+        yield (f"user{i:06d}",) + generate_user(rng, max_days, end_day, **kwargs)
+
+def write_population(population, backend="pickle", path=None):
+    """Writes a generated population straight into a fresh store. Returns (users, food rows, weight rows).
+
+    The pickle snapshot is streamed user by user (no journal, no whole-population
+    dict); SQLite gets one batched insert per user and log.
+    """
+    password = datamanager._hash_password(BENCHMARK_PASSWORD)
+    counts = [0, 0, 0]
+
+    def counted():
+        for username, profile, food_log, bmi_history in population:
+            counts[0] += 1
+            counts[1] += len(food_log)
+            counts[2] += len(bmi_history)
+            yield username, profile, food_log, bmi_history
+
+    if backend == "pickle":
+        path = path or datamanager.DATA_FILE
+        tmp_path, _ = datamanager._write_snapshot(path, 0, (
+            (username, password, pickle.dumps({
+                'profile': profile, 'food_log': FoodLog.from_frame(food_log),
+                'bmi_history': BMIHistory.from_frame(bmi_history)}, protocol=datamanager.PICKLE_PROTOCOL), 0)
+            for username, profile, food_log, bmi_history in counted()))
+        os.replace(tmp_path, path)
+        journal_file = datamanager._journal_path(path)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+    elif backend == "sqlite":
+        target = datamanager.SQLiteBackend(path or datamanager.SQLITE_FILE)
+        try:
+            for username, profile, food_log, bmi_history in counted():
+                target.register(username, password, profile)
+                target.append_food(username, food_log.to_dict('records'))
+                target.upsert_bmi(username, bmi_history.to_dict('records'))
+        finally:
+            target.close()
+    else:
+        raise ValueError(f"Unknown storage backend: {backend!r}")
+    return tuple(counts)
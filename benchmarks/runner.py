@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import json
+import random
+import platform
+import threading
+import tracemalloc
+import datetime
+import numpy as np
+import pandas as pd
+import datamanager
+import logic
+from benchmarks.population import BENCHMARK_PASSWORD, FOOD_NAMES, generate_population, write_population
+
+# Calls per scenario that are re-run under tracemalloc for the peak-memory figure;
+# tracing slows everything down, so latencies are measured on untraced calls.
+MEMORY_SAMPLES = 20
+PERCENTILES = (50, 90, 99)
+
+
+# --- Measurement ---
+def _bytes_written():
+    """Bytes this process has passed to write() so far, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    if not len(ms):
+        return {}
+    summary = {f"p{p}": round(float(np.percentile(ms, p)), 3) for p in PERCENTILES}
+    summary.update(mean=round(float(ms.mean()), 3), max=round(float(ms.max()), 3))
+    return summary
+
+def measure(fn, calls, setup=None, teardown=None):
+    """Times fn(*args) for each args tuple in `calls`.
+
+    `setup`/`teardown` run around every call with the same arguments and are not
+    timed. Returns latency percentiles, bytes written (storage flushed first) and the
+    peak traced allocation over the first MEMORY_SAMPLES calls, which are repeated.
+    """
+    written_before = _bytes_written()
+    timings = []
+    started = time.perf_counter()
+    for args in calls:
+        if setup:
+            setup(*args)
+        t0 = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - t0)
+        if teardown:
+            teardown(*args)
+    logic.storage.flush()
+    total = time.perf_counter() - started
+    written_after = _bytes_written()
+
+    tracemalloc.start()
+    try:
+        for args in calls[:MEMORY_SAMPLES]:
+            if setup:
+                setup(*args)
+            fn(*args)
+            if teardown:
+                teardown(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'calls': len(timings),
+        'total_seconds': round(total, 4),
+        'latency_ms': _latency_summary(timings),
+        'peak_memory_bytes': peak,
+        'bytes_written': None if written_before is None else written_after - written_before,
+    }
+
+
+# --- Scenarios ---
+def _reopen_storage():
+    """Replaces the storage logic.py opened at import, after the population was written under it."""
+    logic.storage.close()
+    datamanager._storage = logic.storage = datamanager.open_storage()
+    logic.result_cache.clear()
+    logic._daily_totals.clear()
+
+def populate(config):
+    population = generate_population(config['users'], config['days'], config['seed'])
+    written_before = _bytes_written()
+    started = time.perf_counter()
+    users, food_rows, weight_rows = write_population(population, config['backend'])
+    elapsed = time.perf_counter() - started
+    _reopen_storage()
+    data_file = datamanager.DATA_FILE if config['backend'] == "pickle" else datamanager.SQLITE_FILE
+    return {
+        'users': users, 'food_rows': food_rows, 'weight_rows': weight_rows,
+        'total_seconds': round(elapsed, 4),
+        'bytes_written': None if written_before is None else _bytes_written() - written_before,
+        'file_bytes': os.path.getsize(data_file),
+    }
+
+def _cold_status(username):
+    logic.result_cache.clear()
+    logic._daily_totals.pop(username, None)
+
+def _login(username):
+    logic.login_user(username, BENCHMARK_PASSWORD)
+
+def _logout(username):
+    logic.logout(username)
+
+def handler_scenarios(usernames, config):
+    """Times each handler on randomly chosen users, without the Gradio UI."""
+    rng = random.Random(config['seed'])
+    picks = [(rng.choice(usernames),) for _ in range(config['calls'])]
+    foods = [(str(rng.choice(FOOD_NAMES)), rng.randint(50, 800), u) for (u,) in picks]
+    weights = [(round(rng.uniform(50, 110), 1), u) for (u,) in picks]
+
+    results = {}
+    # Login is measured cold: logging out drops the user from memory again.
+    results['login_user'] = measure(_login, picks, teardown=_logout)
+    for (u,) in set(picks):
+        _login(u)
+    results['add_food'] = measure(logic.add_food, foods)
+    results['update_bmi'] = measure(logic.update_bmi, weights)
+    results['prepare_calorie_status_data'] = measure(logic.prepare_calorie_status_data, picks, setup=_cold_status)
+    results['prepare_calorie_status_data_cached'] = measure(logic.prepare_calorie_status_data, picks)
+    for (u,) in set(picks):
+        _logout(u)
+    return results
+
+def snapshot_scenarios(config):
+    """Times load_data/save_data on the whole population (pickle backend only)."""
+    if config['backend'] != "pickle":
+        return {}
+    logic.storage.flush()
+    loaded = {}
+
+    def load():
+        loaded['data'] = datamanager.load_data(datamanager.DATA_FILE)
+
+    results = {'load_data': measure(load, [()] * config['repeat'])}
+    copy_file = os.path.join(datamanager.DRIVE_FOLDER_PATH, "benchmark_save_copy.pkl")
+    results['save_data'] = measure(datamanager.save_data, [(loaded['data'], copy_file)] * config['repeat'])
+    os.remove(copy_file)
+    return results
+
+def concurrency_scenario(usernames, config):
+    """Many threads adding food and logging weight on a small set of users at once.
+
+    Checks afterwards that no food entry was lost and that every maintained daily
+    aggregate still matches a rebuild from storage.
+    """
+    rng = random.Random(config['seed'] + 1)
+    hot_users = rng.sample(usernames, min(len(usernames), max(2, config['threads'] // 2)))
+    before = {u: len(logic.storage.get_food_log(u)) for u in hot_users}
+    added = {u: 0 for u in hot_users}
+    added_lock = threading.Lock()
+    timings = []
+
+    def worker(k):
+        thread_rng = random.Random(config['seed'] * 1000 + k)
+        local = []
+        for i in range(config['ops_per_thread']):
+            u = thread_rng.choice(hot_users)
+            t0 = time.perf_counter()
+            if i % 5 == 0:
+                logic.update_bmi(round(thread_rng.uniform(50, 110), 1), u)
+            else:
+                logic.add_food("Apple", 95, u)
+                with added_lock:
+                    added[u] += 1
+            local.append(time.perf_counter() - t0)
+        with added_lock:
+            timings.extend(local)
+
+    written_before = _bytes_written()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(config['threads'])]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    logic.storage.flush()
+    elapsed = time.perf_counter() - started
+
+    lost = sum(before[u] + added[u] - len(logic.storage.get_food_log(u)) for u in hot_users)
+    return {
+        'threads': config['threads'], 'users': len(hot_users), 'calls': len(timings),
+        'total_seconds': round(elapsed, 4),
+        'throughput_per_second': round(len(timings) / elapsed, 1) if elapsed else None,
+        'latency_ms': _latency_summary(timings),
+        'bytes_written': None if written_before is None else _bytes_written() - written_before,
+        'lost_food_rows': lost,
+        'daily_totals_consistent': all(logic.check_daily_totals(u) for u in hot_users),
+    }
+
+
+# --- Entry Points ---
+def environment():
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+def run_benchmarks(config):
+    """Runs every scenario for `config` (see benchmarks.__main__) and returns the results dict."""
+    results = {'populate': populate(config)}
+    usernames = logic.storage.list_users()
+    results.update(handler_scenarios(usernames, config))
+    results.update(snapshot_scenarios(config))
+    if config['threads'] > 0:
+        results['concurrency'] = concurrency_scenario(usernames, config)
+    logic.storage.close()
+    return {'config': config, 'environment': environment(), 'peak_rss_bytes': _peak_rss(), 'results': results}
+
+def compare(baseline, current, threshold=1.2):
+    """Lists scenarios whose p50 or p99 latency grew by more than `threshold` times.
+
+    Both arguments are result dicts as written by run_benchmarks. Returns a list of
+    (scenario, percentile, baseline ms, current ms) tuples.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name, {}).get('latency_ms', {})
+        for key in ('p50', 'p99'):
+            if key in old and key in result.get('latency_ms', {}) and old[key] > 0:
+                if result['latency_ms'][key] > old[key] * threshold:
+                    regressions.append((name, key, old[key], result['latency_ms'][key]))
+    return regressions
+
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
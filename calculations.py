@@ -0,0 +1,76 @@
+import numpy as np
+
+# Pure health formulas, shared by the app (logic.py) and offline tools that must not
+# open storage or import the UI.
+
+# --- Health Formulas ---
+ACTIVITY_MULTIPLIERS = {"Sedentary": 1.2, "Lightly active": 1.375, "Moderately active": 1.55, "Very active": 1.725, "Extremely active": 1.9}
+DEFAULT_ACTIVITY_MULTIPLIER = 1.2
+BMI_CATEGORIES = ["Underweight", "Normal", "Overweight", "Obese"]
+DEFAULT_TDEE_GOAL = 2000 # Used for days before any TDEE has been logged
+
+def calculate_tdee(profile, weight):
+    """Calculates TDEE and BMR based on profile data and a specific weight."""
+    age, gender, height, activity_level = profile['age'], profile['gender'], profile['height'], profile['activity_level']
+
+    if gender == "Male":
+        bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
+    else:
+        bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+
+    tdee = bmr * ACTIVITY_MULTIPLIERS.get(activity_level, DEFAULT_ACTIVITY_MULTIPLIER)
+    return round(bmr), round(tdee)
+
+def calculate_bmi(height, weight):
+    """Pure BMI calculation."""
+    if height > 0:
+        bmi = weight / ((height / 100) ** 2)
+    else:
+        bmi = 0
+
+    category = "Underweight"
+    if 18.5 <= bmi < 24.9:
+        category = "Normal"
+    elif 25 <= bmi < 29.9:
+        category = "Overweight"
+    elif bmi >= 30:
+        category = "Obese"
+    return f"{bmi:.1f}", category
+
+def calculate_bmi_value(height, weight):
+    """BMI as the number stored in bmi_history (rounded to one decimal)."""
+    return round(weight / ((height / 100) ** 2), 1) if height > 0 else 0.0
+
+# --- Batch Calculations ---
+def calculate_bmi_batch(heights, weights):
+    """Vectorized calculate_bmi.
+
+    Returns (unrounded BMI array, category code array indexing BMI_CATEGORIES), using
+    exactly the scalar function's thresholds.
+    """
+    heights = np.asarray(heights, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    bmi = np.zeros(np.broadcast(heights, weights).shape)
+    np.divide(weights, (heights / 100) ** 2, out=bmi, where=heights > 0)
+
+    codes = np.zeros(bmi.shape, dtype=np.int8)
+    codes[(bmi >= 18.5) & (bmi < 24.9)] = 1
+    codes[(bmi >= 25) & (bmi < 29.9)] = 2
+    codes[bmi >= 30] = 3
+    return bmi, codes
+
+def calculate_tdee_batch(ages, genders, heights, weights, activity_levels):
+    """Vectorized calculate_tdee. Returns (BMR array, TDEE array), both rounded."""
+    ages, heights, weights = (np.asarray(a, dtype=float) for a in (ages, heights, weights))
+    genders = np.asarray(genders, dtype=object)
+    activity_levels = np.asarray(activity_levels, dtype=object)
+
+    bmr = np.where(
+        genders == "Male",
+        88.362 + (13.397 * weights) + (4.799 * heights) - (5.677 * ages),
+        447.593 + (9.247 * weights) + (3.098 * heights) - (4.330 * ages)
+    )
+    multipliers = np.full(bmr.shape, DEFAULT_ACTIVITY_MULTIPLIER)
+    for level, multiplier in ACTIVITY_MULTIPLIERS.items():
+        multipliers[activity_levels == level] = multiplier
+    return np.round(bmr), np.round(bmr * multipliers)
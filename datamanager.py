@@ -1,17 +1,48 @@
 import os
+import mmap
+import json
+import shutil
+import tempfile
+import time
+import struct
 import pickle
+import sqlite3
 import hashlib
-from google.colab import drive
+import threading
+import weakref
+import importlib.util
+import atexit
+import logging
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import metrics
+from healthlog import FoodLog, BMIHistory
 
 # --- Google Drive Connection ---
-# This part needs to be run in an environment like Google Colab.
-# If running locally, you would adjust the path.
-try:
-    drive.mount('/content/drive')
-    DRIVE_FOLDER_PATH = "/content/drive/MyDrive/HealthApp/"
-except Exception as e:
-    print(f"Could not mount Google Drive. Using local folder. Error: {e}")
-    DRIVE_FOLDER_PATH = "HealthAppData/"
+# Drive is only mounted when running inside Google Colab. google.colab is not
+# imported at all elsewhere, so plain deployments don't pay for it; they can
+# also point HEALTHAPP_DATA_DIR at any folder.
+LOCAL_FOLDER_PATH = "HealthAppData/"
+
+def _data_folder():
+    if os.environ.get("HEALTHAPP_DATA_DIR"):
+        return os.environ["HEALTHAPP_DATA_DIR"]
+    try:
+        in_colab = importlib.util.find_spec("google.colab") is not None
+    except ModuleNotFoundError:
+        in_colab = False
+    if not in_colab:
+        return LOCAL_FOLDER_PATH
+    from google.colab import drive
+    try:
+        drive.mount('/content/drive')
+        return "/content/drive/MyDrive/HealthApp/"
+    except Exception as e:
+        print(f"Could not mount Google Drive. Using local folder. Error: {e}")
+        return LOCAL_FOLDER_PATH
+
+DRIVE_FOLDER_PATH = _data_folder()
 
 
 # --- Data Persistence ---
@@ -19,28 +50,1119 @@ if not os.path.exists(DRIVE_FOLDER_PATH):
     os.makedirs(DRIVE_FOLDER_PATH)
 
 DATA_FILE = os.path.join(DRIVE_FOLDER_PATH, "user_health_data.pkl")
+SQLITE_FILE = os.path.join(DRIVE_FOLDER_PATH, "user_health_data.sqlite3")
+
+# Which backend get_storage() opens: "pickle" (default) or "sqlite".
+STORAGE_BACKEND = os.environ.get("HEALTHAPP_STORAGE", "pickle")
+
+# Journal entries are written in groups: whichever comes first of FLUSH_INTERVAL
+# seconds or FLUSH_BATCH_SIZE queued entries. Once COMPACT_THRESHOLD entries have
+# accumulated in the journal it is folded into a fresh snapshot.
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH_SIZE = 64
+COMPACT_THRESHOLD = 1000
+
+# The pickle backend keeps at most MAX_RESIDENT_USERS user records in memory and
+# drops records that have not been touched for RESIDENT_IDLE_SECONDS.
+MAX_RESIDENT_USERS = int(os.environ.get("HEALTHAPP_MAX_RESIDENT_USERS", 1000))
+RESIDENT_IDLE_SECONDS = 30 * 60
+
+# Indexed snapshot layout: header (magic, index offset), one pickled record per user,
+# then the pickled index {'seq': n, 'users': {username: (password, offset, length, seq)}}
+# where the per-user seq is the last journal entry folded into that user's record.
+SNAPSHOT_MAGIC = b"HSNAP002"
+SNAPSHOT_HEADER = struct.Struct("<8sQ")
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+FOOD_LOG_COLUMNS = FoodLog.COLUMNS
+BMI_HISTORY_COLUMNS = BMIHistory.COLUMNS
+
+logger = logging.getLogger("healthapp.storage")
 
 
 def _hash_password(password):
     """Hashes the password using SHA-256 for secure storage."""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def save_data(data):
-    """Saves the main data dictionary to a pickle file."""
-    with open(DATA_FILE, "wb") as f:
-        pickle.dump(data, f)
+def _journal_path(data_file):
+    return os.path.splitext(data_file)[0] + ".journal"
+
+def _fsync_and_close(f):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+def _counted(frame):
+    """Records a read log frame's rows with the metrics layer and returns it."""
+    metrics.record_rows(len(frame))
+    return frame
+
+def _new_record(profile):
+    return {'profile': dict(profile), 'food_log': FoodLog(), 'bmi_history': BMIHistory()}
+
+def _apply(record, op, payload):
+    """Applies one journal operation to a user record and returns it ('register' creates it)."""
+    if op == 'register':
+        return _new_record(payload['profile'])
+    if op == 'profile':
+        record['profile'] = dict(payload)
+    elif op == 'food':
+        record['food_log'].extend(payload)
+    elif op == 'bmi':
+        record['bmi_history'].extend(payload)
+    else:
+        raise ValueError(f"Unknown journal operation: {op!r}")
+    return record
+
+
+# --- Storage Interface ---
+class StorageBackend:
+    """Per-user reads and writes used by the logic module.
+
+    Log reads return DataFrames with FOOD_LOG_COLUMNS / BMI_HISTORY_COLUMNS, optionally
+    restricted to an inclusive 'YYYY-MM-DD' date range. Callers must not mutate them.
+    Writes take lists of row dicts so that a batch costs a single persistence step.
+    """
+
+    def __init__(self):
+        # Weak values: a user's lock lives only while some thread holds or waits on it,
+        # so the table doesn't grow with every user who ever logged in.
+        self._user_locks = weakref.WeakValueDictionary()
+        self._user_locks_guard = threading.Lock()
+        # Held across the exists-check and insert so two registrations can't both succeed.
+        self._registration_lock = threading.Lock()
+
+    def user_lock(self, username):
+        """Returns the re-entrant lock that serializes reads-then-writes for one user."""
+        with self._user_locks_guard:
+            lock = self._user_locks.get(username)
+            if lock is None:
+                lock = self._user_locks[username] = threading.RLock()
+            return lock
+
+    def user_exists(self, username):
+        raise NotImplementedError
+
+    def list_users(self):
+        raise NotImplementedError
+
+    def get_password(self, username):
+        """Returns the stored password hash, or None if the user does not exist."""
+        raise NotImplementedError
+
+    def get_profile(self, username):
+        raise NotImplementedError
+
+    def get_food_log(self, username, start=None, end=None):
+        raise NotImplementedError
+
+    def get_bmi_history(self, username, start=None, end=None):
+        raise NotImplementedError
+
+    def iter_food_log(self, username, chunk_size):
+        """Yields the food log as DataFrames of at most chunk_size rows, in insertion order."""
+        raise NotImplementedError
+
+    def food_log_size(self, username):
+        raise NotImplementedError
+
+    def get_food_log_page(self, username, offset, limit):
+        """Up to `limit` food entries, most recently logged first, skipping the `offset` newest."""
+        raise NotImplementedError
+
+    def iter_bmi_history(self, username, chunk_size):
+        """Yields the BMI history as DataFrames of at most chunk_size rows, in date order."""
+        raise NotImplementedError
+
+    def register(self, username, password_hash, profile):
+        """Creates a user. Returns False if the username is already taken."""
+        raise NotImplementedError
+
+    def save_profile(self, username, profile):
+        raise NotImplementedError
+
+    def append_food(self, username, rows):
+        raise NotImplementedError
+
+    def upsert_bmi(self, username, rows):
+        """Inserts BMI rows, replacing any existing row with the same Date."""
+        raise NotImplementedError
+
+    def release(self, username):
+        """Hints that the user's session ended, so cached state may be dropped."""
+
+    def flush(self):
+        """Blocks until every accepted write is durable."""
+
+    def close(self):
+        self.flush()
+
+
+# --- Pickle Backend ---
+class _Journal:
+    """Append-only log of mutations, flushed in groups by a background thread.
+
+    Entries are pickled when queued, by the writing thread and outside the queue's lock,
+    so the handler's metrics count their size and the flusher only concatenates bytes.
+    Different users' entries can therefore reach the file slightly out of sequence
+    order; each user's own entries stay in order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = 0
+        self.entries_on_disk = 0
+        self._pending = []
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self.io_lock = threading.Lock()
+
+    def next_seq(self):
+        with self._cond:
+            self.seq += 1
+            return self.seq
+
+    @metrics.persistence("journal_append")
+    def enqueue(self, entry):
+        """Queues a numbered (seq, op, username, payload) entry for the flusher."""
+        data = pickle.dumps(entry, protocol=PICKLE_PROTOCOL)
+        with self._cond:
+            self._pending.append(data)
+            if len(self._pending) >= FLUSH_BATCH_SIZE:
+                self._cond.notify()
+        metrics.record_bytes("journal_append", len(data))
+
+    def read(self, snapshot_seq, repair=True):
+        """Returns the journal entries newer than the snapshot and drops any torn tail.
+
+        With repair=False a torn tail is only skipped: read-only readers must not truncate
+        a journal that another process may be appending to at that moment.
+        """
+        self.seq = snapshot_seq
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        good_offset = 0
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    entry = pickle.load(f)
+                except (pickle.UnpicklingError, EOFError, ValueError):
+                    # A crash mid-append leaves a partial record; everything before it is intact.
+                    break
+                good_offset = f.tell()
+                self.entries_on_disk += 1
+                if entry[0] > snapshot_seq:
+                    entries.append(entry)
+                    self.seq = max(self.seq, entry[0])
+        if repair and good_offset < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_offset)
+        return entries
+
+    def start(self, on_threshold, on_tick):
+        """Starts the flusher; `on_threshold` is called once the journal needs compacting
+        and `on_tick` after every flush interval."""
+        self._thread = threading.Thread(target=self._run, args=(on_threshold, on_tick),
+                                        name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stops the flusher after writing whatever is still queued."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    @metrics.persistence("journal_flush")
+    def flush(self):
+        """Writes all queued entries to disk and fsyncs the journal."""
+        with self.io_lock:
+            # Drain under the I/O lock so concurrent flushes keep entries in sequence order.
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            data = b"".join(batch)
+            try:
+                with open(self.path, "ab", buffering=0) as f:
+                    start = f.tell()
+                    try:
+                        view = memoryview(data)
+                        while view:
+                            view = view[f.write(view):]
+                        os.fsync(f.fileno())
+                    except BaseException:
+                        # Drop whatever part of the batch made it to disk, so the retry
+                        # doesn't duplicate entries.
+                        os.ftruncate(f.fileno(), start)
+                        raise
+            except BaseException:
+                # Queue the whole batch again (the open itself may have failed), so a
+                # retry doesn't lose entries either.
+                with self._cond:
+                    self._pending[:0] = batch
+                raise
+            metrics.record_bytes("journal_flush", len(data))
+            self.entries_on_disk += len(batch)
+
+    def truncate(self):
+        with open(self.path, "wb"):
+            pass
+        self.entries_on_disk = 0
+
+    def _run(self, on_threshold, on_tick):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= FLUSH_BATCH_SIZE,
+                                    timeout=FLUSH_INTERVAL)
+                closed = self._closed
+            if closed:
+                return
+            # An error (a full disk, say) must not kill the thread: nothing would be
+            # persisted until close(). Failed flushes are retried on the next pass.
+            try:
+                self.flush()
+                if self.entries_on_disk >= COMPACT_THRESHOLD:
+                    on_threshold()
+                on_tick()
+            except Exception:
+                logger.exception("Journal flusher pass failed; retrying in %s s", FLUSH_INTERVAL)
+
+
+@metrics.persistence("snapshot_write")
+def _write_snapshot(data_file, seq, blobs):
+    """Writes (username, password, record bytes, seq) tuples to `data_file`.tmp and fsyncs it.
+
+    Returns (temp path, index); the caller renames the temp file into place.
+    """
+    tmp_path = f"{data_file}.tmp"
+    index = {}
+    f = open(tmp_path, "wb")
+    f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 0))
+    for username, password, blob, user_seq in blobs:
+        index[username] = (password, f.tell(), len(blob), user_seq)
+        f.write(blob)
+    index_offset = f.tell()
+    pickle.dump({'seq': seq, 'users': index}, f, protocol=PICKLE_PROTOCOL)
+    metrics.record_bytes("snapshot_write", f.tell())
+    f.seek(0)
+    f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, index_offset))
+    _fsync_and_close(f)
+    return tmp_path, index
+
+def _read_snapshot_index(data_file, f=None):
+    """Returns (seq, index) of an indexed snapshot without reading any user record.
+
+    `f`, if given, is an already open handle on the snapshot to read instead of the path.
+    """
+    if f is None:
+        if not os.path.exists(data_file):
+            return 0, {}
+        with open(data_file, "rb") as f:
+            return _read_snapshot_index(data_file, f)
+    f.seek(0)
+    header = f.read(SNAPSHOT_HEADER.size)
+    if not header:
+        return 0, {}
+    # The snapshot is only ever replaced via rename, so a file that fails to parse
+    # is not a half-written save and the error is raised rather than discarding it.
+    magic, index_offset = SNAPSHOT_HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{data_file} is not an indexed snapshot")
+    f.seek(index_offset)
+    index = pickle.load(f)
+    return index['seq'], index['users']
+
+def _read_record(f, location):
+    _, offset, length, _ = location
+    metrics.record_bytes("record_load", length)
+    # Positional read: handles shared between threads have no file position to race on.
+    return pickle.loads(os.pread(f.fileno(), length, offset))
+
+@metrics.persistence("record_load")
+def _build_record(f, location, entries):
+    """Reads a user's snapshot record (if it has one) and applies journal entries to it."""
+    record = _read_record(f, location) if location[1] is not None else None
+    for _, op, _, payload in entries:
+        record = _apply(record, op, payload)
+    return record
+
+def _is_legacy_snapshot(data_file):
+    if not os.path.exists(data_file) or os.path.getsize(data_file) == 0:
+        return False
+    with open(data_file, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC
+
+def _upgrade_legacy_snapshot(data_file, journal):
+    """Rewrites the original whole-dictionary pickle (users with DataFrame logs) as an
+    indexed snapshot, applying any journal entries written since."""
+    with open(data_file, "rb") as f:
+        data = pickle.load(f)
+
+    passwords, records = {}, {}
+    for username, user in data.items():
+        passwords[username] = user['password']
+        records[username] = {'profile': user['profile'], 'food_log': FoodLog.from_frame(user['food_log']),
+                             'bmi_history': BMIHistory.from_frame(user['bmi_history'])}
+    for _, op, username, payload in journal.read(0):
+        if op == 'register':
+            passwords[username] = payload['password']
+        records[username] = _apply(records.get(username), op, payload)
+
+    tmp_path, _ = _write_snapshot(data_file, journal.seq, (
+        (username, passwords[username], pickle.dumps(record, protocol=PICKLE_PROTOCOL), journal.seq)
+        for username, record in records.items()))
+    os.replace(tmp_path, data_file)
+    journal.truncate()
+
+
+class PickleBackend(StorageBackend):
+    """Indexed pickle snapshot plus journal, with user records loaded on demand.
+
+    Only the snapshot index (username -> password hash, offset, length, seq) is read at
+    startup. A user's record is unpickled on first access into a bounded LRU; it can be
+    dropped at any time because the snapshot record plus that user's journal entries
+    since the snapshot (kept in `_pending`) rebuild it.
+
+    `_lock` guards the index, LRU and pending lists and is only held briefly; anything
+    slow (disk reads, pickling) happens under the affected user's lock instead.
+
+    With read_only=True (offline tools reading the files of a running app) nothing is
+    ever written: the journal is not repaired, a legacy snapshot is not upgraded, writes
+    raise, and the snapshot is kept open so the app's compactions don't move records
+    under the captured offsets.
+    """
+
+    def __init__(self, data_file=DATA_FILE, max_resident=MAX_RESIDENT_USERS, background=True, read_only=False):
+        super().__init__()
+        self.data_file = data_file
+        self.max_resident = max_resident
+        self.read_only = read_only
+        self._snapshot = None
+        self._lock = threading.RLock()
+        self._journal = _Journal(_journal_path(data_file))
+        if read_only:
+            seq, entries = self._pin_snapshot()
+        else:
+            if _is_legacy_snapshot(data_file):
+                _upgrade_legacy_snapshot(data_file, self._journal)
+            seq, self._index = _read_snapshot_index(data_file)
+            entries = self._journal.read(seq)
+        self._pending = {}              # username -> journal entries newer than the snapshot
+        self._resident = OrderedDict()  # username -> [record, last access time], LRU order
+        for entry in entries:
+            location = self._index.get(entry[2])
+            # Skip entries a compaction already folded into this user's record.
+            if location is None or entry[0] > location[3]:
+                self._track(entry)
+        # Number new entries above every seq folded into the snapshot. A compaction can fold
+        # entries newer than the snapshot's own seq (users who wrote while it ran); reusing
+        # those numbers after a crash would make replay skip the new entries. The snapshot
+        # seq itself can't simply be raised: other users' entries from that window, not
+        # yet in the snapshot, must still be replayed.
+        self._journal.seq = max([self._journal.seq] + [location[3] for location in self._index.values()])
+        if background and not read_only:
+            self._journal.start(self.compact, self.evict_idle)
+
+    def _pin_snapshot(self):
+        """Opens the current snapshot for a read-only backend. Returns (seq, journal entries).
+
+        A compaction replaces the snapshot and then truncates the journal; if that happens
+        between reading the two, the journal may lack entries the pinned snapshot needs,
+        so the read is retried until the snapshot is still current afterwards.
+        """
+        while True:
+            if _is_legacy_snapshot(self.data_file):
+                raise ValueError(f"{self.data_file} is in the old whole-dictionary format; "
+                                 f"open it once with the app to upgrade it")
+            try:
+                f = open(self.data_file, "rb")
+            except FileNotFoundError:
+                f = None
+            seq, self._index = _read_snapshot_index(self.data_file, f)
+            entries = self._journal.read(seq, repair=False)
+            try:
+                current = os.stat(self.data_file).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == (os.fstat(f.fileno()).st_ino if f is not None else None):
+                self._snapshot = f
+                return seq, entries
+            if f is not None:
+                f.close()
+
+    def _open_snapshot(self):
+        """A handle on the snapshot the index refers to (None if there is none yet)."""
+        if self._snapshot is not None:
+            return os.fdopen(os.dup(self._snapshot.fileno()), "rb")
+        if self.read_only or not os.path.exists(self.data_file):
+            return None
+        return open(self.data_file, "rb")
+
+    def _track(self, entry):
+        _, op, username, payload = entry
+        if op == 'register':
+            # Not in the snapshot yet; its record is rebuilt purely from the journal.
+            self._index[username] = (payload['password'], None, None, 0)
+        self._pending.setdefault(username, []).append(entry)
+
+    def _open_record(self, username):
+        """Captures what is needed to rebuild a record. Caller must hold `_lock`.
+
+        The snapshot file is opened here so its offsets match the captured location even
+        if a compaction renames a new snapshot into place right afterwards.
+        """
+        location = self._index[username]
+        f = self._open_snapshot() if location[1] is not None else None
+        return f, location, list(self._pending.get(username, ()))
+
+    def _record(self, username):
+        with self._lock:
+            slot = self._resident.get(username)
+            if slot is not None:
+                self._resident.move_to_end(username)
+                slot[1] = time.monotonic()
+                return slot[0]
+        # Load under the user's lock, so no write to this user can slip in meanwhile.
+        with self.user_lock(username):
+            with self._lock:
+                slot = self._resident.get(username)
+                if slot is not None:
+                    return slot[0]
+                f, location, entries = self._open_record(username)
+            try:
+                record = _build_record(f, location, entries)
+            finally:
+                if f is not None:
+                    f.close()
+            with self._lock:
+                self._resident[username] = [record, time.monotonic()]
+                while len(self._resident) > self.max_resident:
+                    self._resident.popitem(last=False)
+            return record
+
+    def _commit(self, op, username, payload):
+        if self.read_only:
+            raise RuntimeError(f"{self.data_file} is open read-only")
+        with self.user_lock(username):
+            if op != 'register':
+                # Apply before journaling: a payload the logs reject raises here and is
+                # never written, so it can't break every later load of this user. (Also,
+                # loading after tracking the entry would apply it twice.)
+                _apply(self._record(username), op, payload)
+            # Numbered and tracked together under `_lock`, so a compaction never reads a seq
+            # past an entry it can't see yet. Pickling happens after, under the user's lock only.
+            with self._lock:
+                entry = (self._journal.next_seq(), op, username, payload)
+                self._track(entry)
+            self._journal.enqueue(entry)
+
+    def user_exists(self, username):
+        return username in self._index
+
+    def list_users(self):
+        with self._lock:
+            return list(self._index)
+
+    def get_password(self, username):
+        location = self._index.get(username)
+        return location[0] if location else None
+
+    def get_profile(self, username):
+        return self._record(username)['profile']
+
+    def get_food_log(self, username, start=None, end=None):
+        return _counted(self._record(username)['food_log'].to_frame(start, end))
+
+    def get_bmi_history(self, username, start=None, end=None):
+        return _counted(self._record(username)['bmi_history'].to_frame(start, end))
+
+    def _iter_log(self, username, key, chunk_size):
+        log = self._record(username)[key]
+        for lo in range(0, len(log), chunk_size):
+            yield log.frame_slice(lo, lo + chunk_size)
+
+    def iter_food_log(self, username, chunk_size):
+        return self._iter_log(username, 'food_log', chunk_size)
 
-def load_data():
-    """Loads data from the pickle file if it exists, otherwise returns an empty dictionary."""
-    if os.path.exists(DATA_FILE):
+    def food_log_size(self, username):
+        return len(self._record(username)['food_log'])
+
+    def get_food_log_page(self, username, offset, limit):
+        log = self._record(username)['food_log']
+        n = len(log)
+        page = log.frame_slice(max(n - offset - limit, 0), max(n - offset, 0))
+        return _counted(page.iloc[::-1].reset_index(drop=True))
+
+    def iter_bmi_history(self, username, chunk_size):
+        return self._iter_log(username, 'bmi_history', chunk_size)
+
+    def register(self, username, password_hash, profile):
+        with self._registration_lock:
+            if username in self._index:
+                return False
+            self._commit('register', username, {'password': password_hash, 'profile': dict(profile)})
+        return True
+
+    def save_profile(self, username, profile):
+        self._commit('profile', username, dict(profile))
+
+    def append_food(self, username, rows):
+        rows = list(rows)
+        metrics.record_rows(len(rows))
+        self._commit('food', username, rows)
+
+    def upsert_bmi(self, username, rows):
+        rows = list(rows)
+        metrics.record_rows(len(rows))
+        self._commit('bmi', username, rows)
+
+    def release(self, username):
+        with self._lock:
+            self._resident.pop(username, None)
+
+    def evict_idle(self):
+        """Drops resident records that have not been accessed for RESIDENT_IDLE_SECONDS."""
+        cutoff = time.monotonic() - RESIDENT_IDLE_SECONDS
+        with self._lock:
+            for username in [u for u, (_, last_access) in self._resident.items() if last_access < cutoff]:
+                del self._resident[username]
+
+    def iter_users(self):
+        """Yields (username, password hash, record) for every user without caching them."""
+        with self._lock:
+            index = dict(self._index)
+            pending = {u: list(entries) for u, entries in self._pending.items()}
+            f = self._open_snapshot()
+        try:
+            for username, location in index.items():
+                yield username, location[0], _build_record(f, location, pending.get(username, ()))
+        finally:
+            if f is not None:
+                f.close()
+
+    def flush(self):
+        self._journal.flush()
+
+    @metrics.persistence("compact")
+    def compact(self):
+        """Writes a new indexed snapshot and truncates the journal it supersedes.
+
+        Users are captured one at a time under their own lock, so writers to other users
+        and all readers keep running. Each index entry records the last journal sequence
+        number folded into that user's record; replay skips anything at or below it.
+        Users without journal entries are copied byte-for-byte from the previous snapshot.
+        """
+        if self.read_only:
+            raise RuntimeError(f"{self.data_file} is open read-only")
+        with self._journal.io_lock:
+            with self._lock:
+                seq = self._journal.seq
+                index = dict(self._index)
+                old = open(self.data_file, "rb") if os.path.exists(self.data_file) else None
+            try:
+                captured, dirty = {}, {}
+                for username in [u for u in index if u in self._pending]:
+                    with self.user_lock(username):
+                        with self._lock:
+                            entries = list(self._pending.get(username, ()))
+                            slot = self._resident.get(username)
+                        record = slot[0] if slot else _build_record(old, index[username], entries)
+                        captured[username] = len(entries)
+                        dirty[username] = (pickle.dumps(record, protocol=PICKLE_PROTOCOL), entries[-1][0])
+
+                def blobs():
+                    for username, (password, offset, length, user_seq) in index.items():
+                        if username in dirty:
+                            blob, user_seq = dirty[username]
+                        else:
+                            old.seek(offset)
+                            blob = old.read(length)
+                        yield username, password, blob, user_seq
+                tmp_path, new_index = _write_snapshot(self.data_file, seq, blobs())
+            finally:
+                if old is not None:
+                    old.close()
+
+            with self._lock:
+                os.replace(tmp_path, self.data_file)
+                self._index.update(new_index)
+                for username, count in captured.items():
+                    remaining = self._pending[username][count:]
+                    if remaining:
+                        self._pending[username] = remaining
+                    else:
+                        del self._pending[username]
+            # Entries still queued in memory are written after this; replay skips the ones
+            # the snapshot already contains by their sequence number.
+            self._journal.truncate()
+
+    def close(self):
+        self._journal.close()
+        if self._snapshot is not None:
+            self._snapshot.close()
+
+
+# --- SQLite Backend ---
+def _row_bytes(rows):
+    """Approximate size of row tuples as written: UTF-8 text plus 8 bytes per number."""
+    return sum(len(value.encode()) if isinstance(value, str) else 8 for row in rows for value in row)
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    profile TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS food_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    date TEXT NOT NULL,
+    food TEXT,
+    calories INTEGER NOT NULL,
+    entry INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_food_log_user_date ON food_log (username, date);
+CREATE INDEX IF NOT EXISTS idx_food_log_user_id ON food_log (username, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_food_log_user_entry ON food_log (username, entry);
+CREATE TABLE IF NOT EXISTS food_log_counts (
+    username TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bmi_history (
+    username TEXT NOT NULL,
+    date TEXT NOT NULL,
+    bmi REAL,
+    weight REAL,
+    tdee REAL,
+    PRIMARY KEY (username, date)
+);
+"""
+
+class SQLiteBackend(StorageBackend):
+    """Stores users and logs in SQLite, indexed on (username, date), one connection per thread."""
+
+    def __init__(self, db_file=SQLITE_FILE):
+        super().__init__()
+        self.db_file = db_file
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SQLITE_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread is off only so close() can release every thread's connection.
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @metrics.persistence("sqlite_read")
+    def _read_log(self, query, username, start, end, order_by, chunksize=None):
+        params = [username]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(end)
+        result = pd.read_sql_query(f"{query} ORDER BY {order_by}", self._conn(), params=params, chunksize=chunksize)
+        return result if chunksize else _counted(result)
+
+    def user_exists(self, username):
+        return self.get_password(username) is not None
+
+    def list_users(self):
+        return [row[0] for row in self._conn().execute("SELECT username FROM users ORDER BY username")]
+
+    def get_password(self, username):
+        row = self._conn().execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    @metrics.persistence("sqlite_read")
+    def get_profile(self, username):
+        row = self._conn().execute("SELECT profile FROM users WHERE username = ?", (username,)).fetchone()
+        return json.loads(row[0])
+
+    FOOD_LOG_QUERY = "SELECT date AS Date, food AS Food, calories AS Calories FROM food_log WHERE username = ?"
+    BMI_HISTORY_QUERY = "SELECT date AS Date, bmi AS BMI, weight AS Weight, tdee AS TDEE FROM bmi_history WHERE username = ?"
+
+    def get_food_log(self, username, start=None, end=None):
+        return self._read_log(self.FOOD_LOG_QUERY, username, start, end, "date, id")
+
+    def get_bmi_history(self, username, start=None, end=None):
+        return self._read_log(self.BMI_HISTORY_QUERY, username, start, end, "date")
+
+    def iter_food_log(self, username, chunk_size):
+        return self._read_log(self.FOOD_LOG_QUERY, username, None, None, "id", chunksize=chunk_size)
+
+    @metrics.persistence("sqlite_read")
+    def food_log_size(self, username):
+        row = self._conn().execute("SELECT entries FROM food_log_counts WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else 0
+
+    @metrics.persistence("sqlite_read")
+    def get_food_log_page(self, username, offset, limit):
+        # Keyset pagination on the per-user entry number (1..n in insertion order): the
+        # page starts at entry n - offset, found through the index instead of skipping
+        # `offset` rows.
+        return _counted(pd.read_sql_query(
+            f"{self.FOOD_LOG_QUERY} AND entry <= (SELECT MAX(entry) FROM food_log WHERE username = ?) - ? "
+            "ORDER BY entry DESC LIMIT ?", self._conn(), params=[username, username, offset, limit]))
+
+    def iter_bmi_history(self, username, chunk_size):
+        return self._read_log(self.BMI_HISTORY_QUERY, username, None, None, "date", chunksize=chunk_size)
+
+    @metrics.persistence("sqlite_write")
+    def register(self, username, password_hash, profile):
+        row = (username, password_hash, json.dumps(profile))
+        metrics.record_bytes("sqlite_write", _row_bytes([row]))
+        with self._registration_lock, self._conn() as conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO users (username, password, profile) VALUES (?, ?, ?)", row)
+        return cursor.rowcount == 1
+
+    @metrics.persistence("sqlite_write")
+    def save_profile(self, username, profile):
+        row = (json.dumps(profile), username)
+        metrics.record_bytes("sqlite_write", _row_bytes([row]))
+        with self._conn() as conn:
+            conn.execute("UPDATE users SET profile = ? WHERE username = ?", row)
+
+    @metrics.persistence("sqlite_write")
+    def append_food(self, username, rows):
+        with self._conn() as conn:
+            self._insert_food(conn, username, rows)
+
+    @metrics.persistence("sqlite_write")
+    def upsert_bmi(self, username, rows):
+        with self._conn() as conn:
+            self._insert_bmi(conn, username, rows)
+
+    @metrics.persistence("sqlite_write")
+    def import_user(self, username, password_hash, profile, food_rows, bmi_rows):
+        """Registers a user together with their logs in one transaction. Returns False if the username exists."""
+        row = (username, password_hash, json.dumps(profile))
+        metrics.record_bytes("sqlite_write", _row_bytes([row]))
+        with self._registration_lock, self._conn() as conn:
+            if conn.execute("INSERT OR IGNORE INTO users (username, password, profile) VALUES (?, ?, ?)",
+                            row).rowcount != 1:
+                return False
+            self._insert_food(conn, username, food_rows)
+            self._insert_bmi(conn, username, bmi_rows)
+        return True
+
+    def _insert_food(self, conn, username, rows):
+        rows = [(username, r['Date'], r['Food'], int(r['Calories'])) for r in rows]
+        metrics.record_rows(len(rows))
+        metrics.record_bytes("sqlite_write", _row_bytes(rows))
+        # Each insert numbers its entry in the same statement, so it holds the write lock throughout.
+        conn.executemany("INSERT INTO food_log (username, date, food, calories, entry) VALUES (?, ?, ?, ?, "
+                         "(SELECT COALESCE(MAX(entry), 0) + 1 FROM food_log WHERE username = ?))",
+                         [row + (username,) for row in rows])
+        # Kept alongside the log so the Food Tracker's page count doesn't scan it.
+        conn.execute("INSERT INTO food_log_counts (username, entries) VALUES (?, ?) "
+                     "ON CONFLICT (username) DO UPDATE SET entries = entries + excluded.entries",
+                     (username, len(rows)))
+
+    def _insert_bmi(self, conn, username, rows):
+        rows = [(username, r['Date'], float(r['BMI']), float(r['Weight']), float(r['TDEE'])) for r in rows]
+        metrics.record_rows(len(rows))
+        metrics.record_bytes("sqlite_write", _row_bytes(rows))
+        conn.executemany("INSERT OR REPLACE INTO bmi_history (username, date, bmi, weight, tdee) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+# --- Columnar Snapshot ---
+# A pickle-free snapshot for offline tools: every table is stored as one typed array
+# per column with all users' rows back to back, and `<table>.offsets` (n_users + 1
+# int64s) gives each user's row range. Arrays are little-endian and 64-byte aligned,
+# so a reader can mmap the file and view them in place. Each user's food names (see
+# FoodLog) are one UTF-8 blob with byte offsets; `names.offsets` gives each user's
+# range of names, which their food codes index. Usernames, password hashes, profiles
+# and the array layout are a JSON footer.
+COLUMNAR_FILE = os.path.join(DRIVE_FOLDER_PATH, "user_health_data.hcol")
+COLUMNAR_MAGIC = b"HCOLSNAP"
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER = struct.Struct("<8sIQQ")  # magic, version, footer offset, footer length
+COLUMNAR_ALIGNMENT = 64
+COLUMNAR_TABLES = {'food': FoodLog, 'bmi': BMIHistory}
+
+
+def _columnar_layout():
+    """Column name -> little-endian dtype, in file order."""
+    layout = {}
+    for table, log_type in COLUMNAR_TABLES.items():
+        layout[f"{table}.offsets"] = '<i8'
+        for name, dtype in log_type.DTYPES.items():
+            layout[f"{table}.{name}"] = np.dtype(dtype).newbyteorder('<').str
+    layout.update({'names.offsets': '<i8', 'names.name_offsets': '<i8', 'names.data': '|u1'})
+    return layout
+
+@metrics.persistence("columnar_write")
+def write_columnar_snapshot(path, users, seq=0):
+    """Writes (username, password hash, record) tuples as a columnar snapshot. Returns the user count.
+
+    Users are streamed: each column is spooled to its own temporary file and the
+    columns are then copied one after the other into `path`.tmp, which is renamed
+    into place once fsynced.
+    """
+    layout = _columnar_layout()
+    spools = {name: tempfile.TemporaryFile() for name in layout}
+    counts = dict.fromkeys(layout, 0)
+    accounts = []
+
+    def spool(name, values):
+        values = np.ascontiguousarray(values, dtype=layout[name])
+        spools[name].write(values.tobytes())
+        counts[name] += len(values)
+
+    try:
+        totals = {'food': 0, 'bmi': 0, 'names': 0, 'bytes': 0}
+        for name in ('food.offsets', 'bmi.offsets', 'names.offsets', 'names.name_offsets'):
+            spool(name, [0])
+        for username, password, record in users:
+            accounts.append([username, password, record['profile']])
+            for table, key in (('food', 'food_log'), ('bmi', 'bmi_history')):
+                log = record[key]
+                for name in log.DTYPES:
+                    spool(f"{table}.{name}", log.column(name))
+                totals[table] += len(log)
+                spool(f"{table}.offsets", [totals[table]])
+            names = [name.encode() for name in record['food_log'].food_names()]
+            for name in names:
+                spool('names.data', np.frombuffer(name, dtype='u1'))
+                totals['bytes'] += len(name)
+                spool('names.name_offsets', [totals['bytes']])
+            totals['names'] += len(names)
+            spool('names.offsets', [totals['names']])
+
+        tmp_path = f"{path}.tmp"
+        columns = {}
+        with open(tmp_path, "wb") as f:
+            f.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, 0, 0))
+            for name, spooled in spools.items():
+                f.write(b"\0" * (-f.tell() % COLUMNAR_ALIGNMENT))
+                columns[name] = {'dtype': layout[name], 'offset': f.tell(), 'count': counts[name]}
+                spooled.seek(0)
+                shutil.copyfileobj(spooled, f)
+            footer = json.dumps({'seq': seq, 'users': accounts, 'columns': columns},
+                                default=lambda value: value.item()).encode()
+            footer_offset = f.tell()
+            f.write(footer)
+            metrics.record_bytes("columnar_write", f.tell())
+            f.seek(0)
+            f.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, footer_offset, len(footer)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        for spooled in spools.values():
+            spooled.close()
+    return len(accounts)
+
+class ColumnarSnapshot:
+    """Read-only, memory-mapped view of a columnar snapshot.
+
+    Opening it reads only the header and JSON footer. `get_record` copies one user's
+    rows out of the mapping, so only that user's pages are read from disk; `scan`
+    returns whole columns as NumPy views of the mapping without copying anything.
+    Also usable as a read-only stand-in for a storage backend in offline tools.
+    """
+
+    def __init__(self, path=COLUMNAR_FILE):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, footer_offset, footer_length = COLUMNAR_HEADER.unpack_from(self._map)
+        if magic != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar snapshot")
+        if version > COLUMNAR_VERSION:
+            raise ValueError(f"{path} has columnar snapshot version {version}; this version reads up to {COLUMNAR_VERSION}")
+        footer = json.loads(self._map[footer_offset:footer_offset + footer_length])
+        self.seq = footer['seq']
+        self._accounts = footer['users']
+        self._positions = {account[0]: i for i, account in enumerate(self._accounts)}
+        self._columns = {name: np.frombuffer(self._map, dtype=spec['dtype'], count=spec['count'], offset=spec['offset'])
+                         for name, spec in footer['columns'].items()}
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def list_users(self):
+        return [account[0] for account in self._accounts]
+
+    def position(self, username):
+        """The user's index into the `<table>.offsets` columns."""
+        return self._positions[username]
+
+    def get_password(self, username):
+        i = self._positions.get(username)
+        return self._accounts[i][1] if i is not None else None
+
+    def get_profile(self, username):
+        return dict(self._accounts[self._positions[username]][2])
+
+    def scan(self, table):
+        """All of a table's columns (plus 'offsets') as read-only views of the file."""
+        prefix = f"{table}."
+        return {name[len(prefix):]: column for name, column in self._columns.items() if name.startswith(prefix)}
+
+    def _slice(self, table, i):
+        columns = self.scan(table)
+        lo, hi = columns.pop('offsets')[i:i + 2]
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    def _food_names(self, i):
+        lo, hi = self._columns['names.offsets'][i:i + 2]
+        bounds = self._columns['names.name_offsets'][lo:hi + 1]
+        data = self._columns['names.data']
+        return [data[start:end].tobytes().decode() for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def get_record(self, username):
+        """One user's {'profile', 'food_log', 'bmi_history'} record, as the pickle backend holds it."""
+        i = self._positions[username]
+        return {
+            'profile': dict(self._accounts[i][2]),
+            'food_log': FoodLog.from_columns(self._slice('food', i), self._food_names(i)),
+            'bmi_history': BMIHistory.from_columns(self._slice('bmi', i)),
+        }
+
+    def get_food_log(self, username, start=None, end=None):
+        return self.get_record(username)['food_log'].to_frame(start, end)
+
+    def get_bmi_history(self, username, start=None, end=None):
+        return self.get_record(username)['bmi_history'].to_frame(start, end)
+
+    def iter_users(self):
+        """Yields (username, password hash, record) for every user."""
+        for username, password, _ in self._accounts:
+            yield username, password, self.get_record(username)
+
+    def release(self, username):
+        pass # nothing is cached
+
+    def close(self):
+        self._columns = {}
         try:
-            with open(DATA_FILE, "rb") as f:
-                return pickle.load(f)
-        except (pickle.UnpicklingError, EOFError):
-            # If the file is corrupted or empty, return an empty dict
-            return {}
-    return {}
-
-# --- Load data at startup ---
-# This dictionary will be imported and used by the logic module.
-user_health_data = load_data()
+            self._map.close()
+        except BufferError:
+            pass # arrays returned by scan() are still alive; the mapping goes away with them
+        self._file.close()
+
+
+# --- Backend Selection & Migration ---
+_storage = None
+_storage_lock = threading.Lock()
+
+def open_storage(backend=None):
+    """Creates a new backend instance by name ("pickle" or "sqlite")."""
+    backend = backend or STORAGE_BACKEND
+    if backend == "pickle":
+        return PickleBackend()
+    if backend == "sqlite":
+        return SQLiteBackend()
+    raise ValueError(f"Unknown storage backend: {backend!r}")
+
+def get_storage():
+    """Returns the process-wide backend, opening it on first use."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = open_storage()
+            atexit.register(_storage.close)
+        return _storage
+
+def save_data(data, data_file=DATA_FILE):
+    """Saves a full users dictionary as an atomic indexed snapshot and resets its journal."""
+    tmp_path, _ = _write_snapshot(data_file, 0, (
+        (username, user['password'], pickle.dumps(
+            {'profile': user['profile'], 'food_log': user['food_log'], 'bmi_history': user['bmi_history']},
+            protocol=PICKLE_PROTOCOL), 0)
+        for username, user in data.items()))
+    os.replace(tmp_path, data_file)
+    journal_file = _journal_path(data_file)
+    if os.path.exists(journal_file):
+        os.remove(journal_file)
+
+def load_data(data_file=DATA_FILE):
+    """Loads every user from a snapshot plus its journal into one dictionary.
+
+    This reads the whole dataset and is meant for offline tools; the app itself goes
+    through get_storage(), which loads users on demand.
+    """
+    backend = PickleBackend(data_file, max_resident=0, read_only=True)
+    try:
+        return {username: dict(record, password=password) for username, password, record in backend.iter_users()}
+    finally:
+        backend.close()
+
+def migrate_pickle_to_sqlite(data_file=DATA_FILE, db_file=SQLITE_FILE):
+    """Copies every user from a pickle snapshot (plus journal) into a SQLite database.
+
+    Each user is written in one transaction and users that already exist in the
+    database are skipped, so an interrupted migration can simply be re-run. The source
+    is only read, so this can run on the files of a running app. Returns the number of
+    users copied.
+    """
+    source = PickleBackend(data_file, max_resident=0, read_only=True)
+    target = SQLiteBackend(db_file)
+    migrated = 0
+    try:
+        for username, password, user in source.iter_users():
+            migrated += target.import_user(username, password, user['profile'],
+                                           user['food_log'].to_frame().to_dict('records'),
+                                           user['bmi_history'].to_frame().to_dict('records'))
+    finally:
+        target.close()
+        source.close()
+    return migrated
+
+def convert_pickle_to_columnar(data_file=DATA_FILE, columnar_file=COLUMNAR_FILE):
+    """Writes every user of a pickle snapshot (plus journal) to a columnar snapshot. Returns the user count."""
+    source = PickleBackend(data_file, max_resident=0, read_only=True)
+    try:
+        return write_columnar_snapshot(columnar_file, source.iter_users(), source._journal.seq)
+    finally:
+        source.close()
+
+def check_columnar_snapshot(data_file=DATA_FILE, columnar_file=COLUMNAR_FILE):
+    """Round-trip check: compares every user of a columnar snapshot with the pickle it was converted from.
+
+    Returns the usernames whose password, profile, food log or weight history differ
+    (or that are missing on either side); an empty list means the conversion is exact.
+    """
+    source = PickleBackend(data_file, max_resident=0, read_only=True)
+    snapshot = ColumnarSnapshot(columnar_file)
+    try:
+        mismatched = sorted(set(source.list_users()) ^ set(snapshot.list_users()))
+        for username, password, record in source.iter_users():
+            if username in mismatched:
+                continue
+            converted = snapshot.get_record(username)
+            same = (password == snapshot.get_password(username) and record['profile'] == converted['profile']
+                    and record['food_log'].food_names() == converted['food_log'].food_names())
+            for key in ('food_log', 'bmi_history'):
+                same = same and all(np.array_equal(record[key].column(name), converted[key].column(name))
+                                    for name in record[key].DTYPES)
+            if not same:
+                mismatched.append(username)
+    finally:
+        snapshot.close()
+        source.close()
+    return mismatched
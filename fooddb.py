@@ -0,0 +1,122 @@
+import os
+import bisect
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# --- Food Database ---
+# Bundled food/calorie dataset, used for suggestions only: food logs store the names
+# users typed (see FoodLog), so the CSV can be edited freely. A food's ID is its `id`
+# column, the row's position in the in-memory arrays.
+FOOD_DATABASE_FILE = os.environ.get(
+    "HEALTHAPP_FOOD_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_calories.csv"))
+SUGGESTION_LIMIT = 10
+RECENT_FOODS_SIZE = 100 # Foods remembered per user for suggestions
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a food name, used for matching."""
+    return " ".join(str(name).split()).lower()
+
+class FoodDatabase:
+    """Food names and calories per serving, with sorted prefix indexes for autocomplete.
+
+    `_name_keys` holds each normalized name once; `_word_keys` additionally holds every
+    suffix starting at a word, so "chick" also finds "Grilled Chicken Breast". Both are
+    sorted lists searched with bisect, so a lookup costs O(log n + limit).
+    """
+
+    def __init__(self, ids, names, servings, calories):
+        size = int(max(ids)) + 1 if len(ids) else 0
+        self.names = np.full(size, None, dtype=object)
+        self.servings = np.full(size, None, dtype=object)
+        self.calories = np.zeros(size, dtype='int32')
+        self.names[ids], self.servings[ids], self.calories[ids] = names, servings, calories
+        self._by_name = {normalize_name(name): int(i) for i, name in zip(ids, names)}
+
+        name_keys, word_keys = [], []
+        for i, name in zip(ids, names):
+            words = normalize_name(name).split(" ")
+            name_keys.append((" ".join(words), int(i)))
+            word_keys.extend((" ".join(words[k:]), int(i)) for k in range(len(words)))
+        name_keys.sort()
+        word_keys.sort()
+        self._name_keys = [key for key, _ in name_keys]
+        self._name_ids = np.array([i for _, i in name_keys], dtype='int32')
+        self._word_keys = [key for key, _ in word_keys]
+        self._word_ids = np.array([i for _, i in word_keys], dtype='int32')
+
+    @classmethod
+    def from_csv(cls, path=FOOD_DATABASE_FILE):
+        df = pd.read_csv(path, dtype={'id': 'int32', 'calories': 'int32', 'name': str, 'serving': str},
+                         keep_default_na=False)
+        return cls(df['id'].to_numpy(), df['name'].tolist(), df['serving'].tolist(), df['calories'].to_numpy())
+
+    def __len__(self):
+        return len(self._name_keys)
+
+    def find(self, name):
+        """ID of the food with this name, ignoring case and spacing, or None."""
+        return self._by_name.get(normalize_name(name))
+
+    def search(self, prefix, limit=SUGGESTION_LIMIT):
+        """IDs of up to `limit` foods matching `prefix`: names starting with it first, then
+        names with a later word starting with it, each alphabetically."""
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        found = []
+        for keys, ids in ((self._name_keys, self._name_ids), (self._word_keys, self._word_ids)):
+            i = bisect.bisect_left(keys, prefix)
+            while i < len(keys) and len(found) < limit and keys[i].startswith(prefix):
+                if ids[i] not in found:
+                    found.append(int(ids[i]))
+                i += 1
+        return found
+
+_database = None
+_database_lock = threading.Lock()
+
+def get_food_database():
+    """Returns the bundled food database, loading and indexing it on first use."""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = FoodDatabase.from_csv()
+        return _database
+
+
+# --- Per-User Recent Foods ---
+class RecentFoods:
+    """A user's most recently logged foods (LRU, at most `maxsize`) and how often each was logged.
+
+    Free-text foods are remembered too, with the calories last logged for them.
+    """
+
+    def __init__(self, maxsize=RECENT_FOODS_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()  # normalized name -> [name, calories, food id or None, count]
+
+    def add(self, name, calories, food_id=None):
+        key = normalize_name(name)
+        item = self._items.pop(key, None)
+        count = item[3] + 1 if item else 1
+        self._items[key] = [name, calories, food_id, count]
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def get(self, name):
+        """(name, calories, food id) of a remembered food, or None."""
+        item = self._items.get(normalize_name(name))
+        return tuple(item[:3]) if item else None
+
+    def search(self, prefix, limit=SUGGESTION_LIMIT):
+        """Remembered foods with a word starting with `prefix`, most often logged first (then most recent)."""
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        matches = [(item[3], rank, item) for rank, (key, item) in enumerate(self._items.items())
+                   if key.startswith(prefix) or f" {prefix}" in f" {key}"]
+        matches.sort(key=lambda m: (m[0], m[1]), reverse=True)
+        return [tuple(item[:3]) for _, _, item in matches[:limit]]
@@ -0,0 +1,303 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+# Dates are stored as int32 day numbers (days since 1970-01-01), which keeps
+# range lookups to a searchsorted and avoids re-parsing strings.
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+INITIAL_CAPACITY = 16
+INT32 = np.iinfo('int32')
+
+
+def date_to_days(date_str):
+    """Converts a 'YYYY-MM-DD' string to a day number."""
+    return datetime.date.fromisoformat(date_str[:10]).toordinal() - EPOCH_ORDINAL
+
+def days_to_dates(days):
+    """Converts an array of day numbers back to 'YYYY-MM-DD' strings."""
+    return np.asarray(days, dtype='int64').astype('datetime64[D]').astype(str)
+
+def _check_int32(value, name):
+    """Returns `value`, or raises ValueError if it (or NaN) does not fit the int32 column `name`."""
+    if not INT32.min <= value <= INT32.max:
+        raise ValueError(f"{name} {value} is out of range")
+    return value
+
+def _frame_days(dates):
+    """Parses a Date column (strings or timestamps) into day numbers."""
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]').astype('int32')
+
+
+class _ColumnLog:
+    """Growable set of typed NumPy columns with amortized O(1) appends.
+
+    Subclasses declare DTYPES (column name -> dtype). Arrays are over-allocated and
+    doubled when full, so appending never copies the existing history except on growth.
+    """
+
+    DTYPES = {}
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._n = 0
+        self._cols = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.DTYPES.items()}
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def empty(self):
+        return self._n == 0
+
+    def _reserve(self, extra):
+        needed = self._n + extra
+        capacity = len(self._cols['date'])
+        if needed <= capacity:
+            return
+        capacity = max(capacity * 2, needed, INITIAL_CAPACITY)
+        for name, col in self._cols.items():
+            grown = np.empty(capacity, dtype=col.dtype)
+            grown[:self._n] = col[:self._n]
+            self._cols[name] = grown
+
+    def column(self, name):
+        """Returns a read-only view of the used part of a column (no copy)."""
+        view = self._cols[name][:self._n]
+        view.flags.writeable = False
+        return view
+
+    def _range(self, start, end):
+        """Slice bounds for start <= date <= end; requires the date column to be sorted."""
+        dates = self._cols['date'][:self._n]
+        lo = 0 if start is None else int(np.searchsorted(dates, date_to_days(start), side='left'))
+        hi = self._n if end is None else int(np.searchsorted(dates, date_to_days(end), side='right'))
+        return lo, hi
+
+    @classmethod
+    def from_columns(cls, cols):
+        """Builds a log from equal-length arrays keyed like DTYPES; they are copied, so read-only views work."""
+        n = len(cols['date'])
+        log = cls(max(n, INITIAL_CAPACITY))
+        for name in cls.DTYPES:
+            log._cols[name][:n] = cols[name]
+        log._n = n
+        return log
+
+    def __getstate__(self):
+        # Pickle only the used rows, not the spare capacity.
+        return {'cols': {name: col[:self._n].copy() for name, col in self._cols.items()}}
+
+    def __setstate__(self, state):
+        self._cols = state['cols']
+        self._n = len(self._cols['date'])
+
+
+class FoodLog(_ColumnLog):
+    """A user's food entries: int day numbers, int32 calories and int32 food codes.
+
+    A food code is an index into `_foods`, the log's own list of distinct food names,
+    so each name is stored once per log and reading a log never depends on the food
+    database (whose CSV may be edited between runs).
+    """
+
+    DTYPES = {'date': 'int32', 'calories': 'int32', 'food': 'int32'}
+    COLUMNS = ['Date', 'Food', 'Calories']
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        super().__init__(capacity)
+        self._foods = []
+        self._codes = {}
+        self._sorted = True  # entries are normally logged for today, i.e. in date order
+
+    def _encode(self, food):
+        code = self._codes.get(food)
+        if code is None:
+            # Append the name before handing out its code, so concurrent readers that
+            # see the code also see the name.
+            self._foods.append(food)
+            code = self._codes[food] = len(self._foods) - 1
+        return code
+
+    def _names(self, codes):
+        """Food names for an array of food codes."""
+        foods = list(self._foods)
+        names = np.empty(len(foods), dtype=object)
+        names[:] = foods
+        return names[codes]
+
+    def append(self, date, food, calories):
+        self._append(date_to_days(date), food, _check_int32(calories, 'calories'))
+
+    def _append(self, day, food, calories):
+        self._reserve(1)
+        if self._n and day < self._cols['date'][self._n - 1]:
+            self._sorted = False
+        self._cols['date'][self._n] = day
+        self._cols['calories'][self._n] = calories
+        self._cols['food'][self._n] = self._encode(food)
+        self._n += 1
+
+    def extend(self, rows):
+        """Appends row dicts with 'Date', 'Food' and 'Calories' keys.
+
+        Every row is validated first, so a batch with a bad row raises ValueError and
+        leaves the log unchanged.
+        """
+        rows = [(date_to_days(row['Date']), row['Food'], int(_check_int32(row['Calories'], 'calories')))
+                for row in rows]
+        self._reserve(len(rows))
+        for row in rows:
+            self._append(*row)
+
+    def to_frame(self, start=None, end=None):
+        """Materializes the log (optionally a date range) as a DataFrame."""
+        # Read the length and column references once so a concurrent append can't
+        # produce columns of different lengths.
+        n, dates, calories, foods = self._n, self._cols['date'], self._cols['calories'], self._cols['food']
+        dates, calories, foods = dates[:n], calories[:n], foods[:n]
+        if self._sorted:
+            lo = 0 if start is None else int(np.searchsorted(dates, date_to_days(start), side='left'))
+            hi = n if end is None else int(np.searchsorted(dates, date_to_days(end), side='right'))
+            index = slice(lo, hi)
+        else:
+            mask = np.ones(n, dtype=bool)
+            if start is not None:
+                mask &= dates >= date_to_days(start)
+            if end is not None:
+                mask &= dates <= date_to_days(end)
+            index = np.flatnonzero(mask)
+        return pd.DataFrame({
+            'Date': days_to_dates(dates[index]),
+            'Food': self._names(foods[index]),
+            'Calories': calories[index].copy(),
+        }, columns=self.COLUMNS)
+
+    def frame_slice(self, lo, hi):
+        """Rows lo:hi in insertion order as a DataFrame, without touching the rest of the log."""
+        lo, hi = max(lo, 0), min(hi, self._n)
+        return pd.DataFrame({
+            'Date': days_to_dates(self._cols['date'][lo:hi]),
+            'Food': self._names(self._cols['food'][lo:hi]),
+            'Calories': self._cols['calories'][lo:hi].copy(),
+        }, columns=self.COLUMNS)
+
+    def food_names(self):
+        """The log's distinct food names; food code k refers to the k-th."""
+        return list(self._foods)
+
+    def _set_foods(self, foods):
+        self._foods = list(foods)
+        self._codes = {food: k for k, food in enumerate(self._foods)}
+
+    @classmethod
+    def from_columns(cls, cols, foods=()):
+        log = super().from_columns(cols)
+        log._set_foods(foods)
+        dates = log._cols['date'][:log._n]
+        log._sorted = bool(np.all(dates[1:] >= dates[:-1]))
+        return log
+
+    def _encode_all(self, foods):
+        """Food codes for a sequence of names, encoding each distinct name once."""
+        index, uniques = pd.factorize(pd.Series(foods, dtype=object), use_na_sentinel=False)
+        codes = np.array([self._encode(food) for food in uniques], dtype='int32')
+        return codes[index]
+
+    @classmethod
+    def from_frame(cls, df):
+        log = cls(max(len(df), INITIAL_CAPACITY))
+        if len(df):
+            days = _frame_days(df['Date'])
+            log._cols['date'][:len(df)] = days
+            log._cols['calories'][:len(df)] = df['Calories'].astype('int32').values
+            log._cols['food'][:len(df)] = log._encode_all(df['Food'])
+            log._n = len(df)
+            log._sorted = bool(np.all(days[1:] >= days[:-1]))
+        return log
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # Most logs use few distinct foods, so codes usually fit in two bytes.
+        codes = state['cols']['food']
+        if len(codes) and codes.max() < 2 ** 15:
+            state['cols']['food'] = codes.astype('int16')
+        state['names'] = list(self._foods)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._cols['food'] = self._cols['food'].astype('int32')
+        self._set_foods(state['names'])
+        dates = self._cols['date']
+        self._sorted = bool(np.all(dates[1:] >= dates[:-1]))
+
+
+class BMIHistory(_ColumnLog):
+    """A user's weight log, kept sorted with at most one row per date."""
+
+    DTYPES = {'date': 'int32', 'bmi': 'float64', 'weight': 'float64', 'tdee': 'int32'}
+    COLUMNS = ['Date', 'BMI', 'Weight', 'TDEE']
+
+    def upsert(self, date, bmi, weight, tdee):
+        """Inserts a row, replacing the existing one for the same date in place."""
+        self._upsert(*self._checked(date, bmi, weight, tdee))
+
+    @staticmethod
+    def _checked(date, bmi, weight, tdee):
+        """(day, bmi, weight, tdee) converted for storage; raises ValueError if they don't fit."""
+        return date_to_days(date), float(bmi), float(weight), round(_check_int32(tdee, 'tdee'))
+
+    def _upsert(self, day, bmi, weight, tdee):
+        dates = self._cols['date']
+        if self._n and dates[self._n - 1] == day:
+            i = self._n - 1
+        elif self._n == 0 or dates[self._n - 1] < day:
+            # The common case: a new day appended at the end.
+            self._reserve(1)
+            i = self._n
+            self._n += 1
+        else:
+            i = int(np.searchsorted(dates[:self._n], day))
+            if dates[i] != day:
+                # Back-dated entry: shift the tail right by one (rare).
+                self._reserve(1)
+                for col in self._cols.values():
+                    col[i + 1:self._n + 1] = col[i:self._n].copy()
+                self._n += 1
+        self._cols['date'][i] = day
+        self._cols['bmi'][i] = bmi
+        self._cols['weight'][i] = weight
+        self._cols['tdee'][i] = tdee
+
+    def extend(self, rows):
+        """Upserts row dicts with 'Date', 'BMI', 'Weight' and 'TDEE' keys (all validated first)."""
+        rows = [self._checked(row['Date'], row['BMI'], row['Weight'], row['TDEE']) for row in rows]
+        for row in rows:
+            self._upsert(*row)
+
+    def to_frame(self, start=None, end=None):
+        """Materializes the history (optionally a date range) as a DataFrame."""
+        return self.frame_slice(*self._range(start, end))
+
+    def frame_slice(self, lo, hi):
+        """Rows lo:hi in date order as a DataFrame."""
+        lo, hi = max(lo, 0), min(hi, self._n)
+        return pd.DataFrame({
+            'Date': days_to_dates(self._cols['date'][lo:hi]),
+            'BMI': self._cols['bmi'][lo:hi].copy(),
+            'Weight': self._cols['weight'][lo:hi].copy(),
+            'TDEE': self._cols['tdee'][lo:hi].copy(),
+        }, columns=self.COLUMNS)
+
+    @classmethod
+    def from_frame(cls, df):
+        log = cls(max(len(df), INITIAL_CAPACITY))
+        if len(df):
+            df = df.assign(_day=_frame_days(df['Date']))
+            df = df.drop_duplicates(subset=['_day'], keep='last').sort_values(by='_day')
+            n = len(df)
+            log._cols['date'][:n] = df['_day'].values
+            log._cols['bmi'][:n] = df['BMI'].astype('float64').values
+            log._cols['weight'][:n] = df['Weight'].astype('float64').values
+            log._cols['tdee'][:n] = df['TDEE'].astype('float64').fillna(0).round().values
+            log._n = n
+        return log
@@ -1,8 +1,11 @@
 import gradio as gr
 import pandas as pd
+import metrics
 from logic import (
     register_user, login_user, logout, save_profile, update_bmi,
-    add_food, calculate_bmr_tdee_for_display
+    add_food, calculate_bmr_tdee_for_display, import_history, export_history, metrics_report,
+    get_history_charts, HISTORY_RANGES, DEFAULT_HISTORY_RANGE,
+    newer_food_log_page, older_food_log_page, suggest_foods, choose_food
 )
 
 # --- UI and Styling ---
@@ -19,6 +22,7 @@ def create_ui():
     with gr.Blocks(css=css, theme=gr.themes.Default(primary_hue="pink")) as app:
         gr.Markdown("# 💖 Health Calculator Suite 💖")
         current_user_state = gr.State(None)
+        food_log_page_state = gr.State(1)
 
         # --- LOGIN/REGISTER VIEW ---
         with gr.Column(visible=True) as login_view:
@@ -86,12 +90,28 @@ def create_ui():
                     with gr.Row():
                         with gr.Column(scale=2):
                             food_item_input = gr.Textbox(label="Food Item", placeholder="e.g., Banana")
+                            food_suggestions = gr.Dropdown(label="Suggestions", choices=[], value=None, interactive=True)
                             calories_input = gr.Number(label="Calories", value=0, precision=0)
                             log_button = gr.Button("Add Food Entry")
-                            food_log_df = gr.Dataframe(headers=["Date", "Food", "Calories"], label="Your Food Log", interactive=False)
+                            food_log_df = gr.Dataframe(headers=["Date", "Food", "Calories"], label="Your Food Log (newest first)", interactive=False)
+                            with gr.Row():
+                                newer_page_button = gr.Button("◀ Newer")
+                                food_log_page_info = gr.Markdown("")
+                                older_page_button = gr.Button("Older ▶")
+
+                with gr.TabItem("Import / Export"):
+                    gr.Markdown("### Import History")
+                    gr.Markdown("Upload a CSV or JSON Lines file with `Date`, `Food`, `Calories` and/or `Weight` columns.")
+                    import_file_input = gr.File(label="History File", file_types=[".csv", ".jsonl", ".json"], type="filepath")
+                    import_button = gr.Button("Import")
+                    import_status_message = gr.Markdown("")
+                    gr.Markdown("### Export History")
+                    export_button = gr.Button("Export My History")
+                    export_file_output = gr.File(label="Download", interactive=False)
 
                 with gr.TabItem("Historical Graphs"):
                     gr.Markdown("## Your Progress Over Time")
+                    history_range_input = gr.Radio(choices=list(HISTORY_RANGES), value=DEFAULT_HISTORY_RANGE, label="Time Range")
                     gr.Markdown("### Daily BMI History")
                     bmi_history_plot = gr.LinePlot(x="Date", y="BMI", title="BMI Over Time", tooltip=['Date', 'BMI', 'Weight'])
                     gr.Markdown("### Daily Calorie Intake Status")
@@ -102,6 +122,15 @@ def create_ui():
                         title="Calorie Intake vs. Daily Goal", y_lim=[0, 4000]
                     )
 
+                # Only present when the app runs with HEALTHAPP_METRICS=1.
+                if metrics.ENABLED:
+                    with gr.TabItem("Admin"):
+                        gr.Markdown("## Handler Metrics")
+                        metrics_summary_text = gr.Markdown("")
+                        metrics_table = gr.Dataframe(label="Per-Handler Latency", interactive=False)
+                        refresh_metrics_button = gr.Button("Refresh")
+                        metrics_timer = gr.Timer(5)
+
         # --- Component Connections ---
         register_button.click(
             fn=register_user,
@@ -110,16 +139,17 @@ def create_ui():
         )
 
         login_button.click(
-            fn=login_user, inputs=[login_user_input, login_password_input],
+            fn=login_user, inputs=[login_user_input, login_password_input, history_range_input],
             outputs=[current_user_state, login_view, main_app_view, welcome_message,
                      food_log_df,
                      bmi_history_plot, calorie_status_plot,
                      profile_height_input, profile_weight_input, profile_age_input,
-                     profile_gender_input, activity_level_profile]
+                     profile_gender_input, activity_level_profile,
+                     food_log_page_info, food_log_page_state]
         )
 
         logout_button.click(
-            fn=logout, inputs=None,
+            fn=logout, inputs=[current_user_state],
             outputs=[
                 current_user_state, login_view, main_app_view, login_status_message,
                 food_log_df,
@@ -129,7 +159,8 @@ def create_ui():
                 food_item_input, calories_input,
                 bmi_output, category_output,
                 bmr_output_display, tdee_output_display, loss_output, maintenance_output, gain_output, bmr_info_text,
-                profile_status_message
+                profile_status_message,
+                food_log_page_info, food_log_page_state
             ]
         )
 
@@ -140,18 +171,60 @@ def create_ui():
         )
 
         calculate_bmi_button.click(
-            fn=update_bmi, inputs=[weight_input_bmi, current_user_state],
+            fn=update_bmi, inputs=[weight_input_bmi, current_user_state, history_range_input],
             outputs=[bmi_output, category_output,
                      bmi_history_plot, calorie_status_plot,
                      profile_weight_input]
         )
 
         log_button.click(
-            fn=add_food, inputs=[food_item_input, calories_input, current_user_state],
+            fn=add_food, inputs=[food_item_input, calories_input, current_user_state, history_range_input, food_log_page_state],
             outputs=[food_log_df,
-                     calorie_status_plot]
+                     calorie_status_plot,
+                     food_log_page_info, food_log_page_state]
+        )
+
+        food_item_input.input(
+            fn=suggest_foods, inputs=[food_item_input, current_user_state], outputs=[food_suggestions],
+            trigger_mode="always_last", show_progress="hidden"
+        )
+
+        food_suggestions.input(
+            fn=choose_food, inputs=[food_suggestions, current_user_state],
+            outputs=[food_item_input, calories_input], show_progress="hidden"
+        )
+
+        newer_page_button.click(
+            fn=newer_food_log_page, inputs=[current_user_state, food_log_page_state],
+            outputs=[food_log_df, food_log_page_info, food_log_page_state]
+        )
+
+        older_page_button.click(
+            fn=older_food_log_page, inputs=[current_user_state, food_log_page_state],
+            outputs=[food_log_df, food_log_page_info, food_log_page_state]
         )
 
+        history_range_input.change(
+            fn=get_history_charts, inputs=[current_user_state, history_range_input],
+            outputs=[bmi_history_plot, calorie_status_plot]
+        )
+
+        import_button.click(
+            fn=import_history, inputs=[import_file_input, current_user_state, history_range_input],
+            outputs=[import_status_message, food_log_df,
+                     bmi_history_plot, calorie_status_plot,
+                     food_log_page_info, food_log_page_state]
+        )
+
+        export_button.click(
+            fn=export_history, inputs=[current_user_state],
+            outputs=[export_file_output]
+        )
+
+        if metrics.ENABLED:
+            refresh_metrics_button.click(fn=metrics_report, outputs=[metrics_summary_text, metrics_table], api_name="metrics")
+            metrics_timer.tick(fn=metrics_report, outputs=[metrics_summary_text, metrics_table])
+
         calculate_bmr_button.click(
             fn=calculate_bmr_tdee_for_display,
             inputs=[current_user_state],
@@ -1,207 +1,752 @@
 import pandas as pd
 import numpy as np
 import datetime
+import bisect
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
 import gradio as gr
-from datamanager import user_health_data, save_data, _hash_password
+import metrics
+from fooddb import get_food_database, RecentFoods, RECENT_FOODS_SIZE, SUGGESTION_LIMIT
+from calculations import (
+    ACTIVITY_MULTIPLIERS, DEFAULT_ACTIVITY_MULTIPLIER, BMI_CATEGORIES, DEFAULT_TDEE_GOAL,
+    calculate_tdee, calculate_bmi, calculate_bmi_value,
+    calculate_bmi_batch, calculate_tdee_batch
+)
+from datamanager import get_storage, _hash_password, FOOD_LOG_COLUMNS, BMI_HISTORY_COLUMNS, MAX_RESIDENT_USERS
+
+# Backend selected via HEALTHAPP_STORAGE (see datamanager).
+storage = get_storage()
+
+# Opt-in via HEALTHAPP_METRICS (see metrics); a no-op otherwise.
+metrics.start_reporter()
+
+# --- Result Cache ---
+RESULT_CACHE_SIZE = 512
+
+class ResultCache:
+    """Size-bounded LRU of derived results keyed by (kind, user, data version).
+
+    Cached values (including DataFrames) are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.record_cache(True)
+                return self._entries[key]
+            self.misses += 1
+        metrics.record_cache(False)
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+result_cache = ResultCache()
+
+class UserStateCache:
+    """Per-user derived state that can be rebuilt from storage, for at most `maxsize` users (LRU).
+
+    Sized like the storage's resident users, so users who close the tab without logging
+    out don't keep their state in memory forever; an evicted entry is rebuilt on next use.
+    """
+
+    def __init__(self, maxsize=MAX_RESIDENT_USERS):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, default=None):
+        with self._lock:
+            if username not in self._entries:
+                return default
+            self._entries.move_to_end(username)
+            return self._entries[username]
+
+    def __setitem__(self, username, value):
+        with self._lock:
+            self._entries[username] = value
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, username, default=None):
+        with self._lock:
+            return self._entries.pop(username, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# username -> data version. Every mutating handler bumps it (under the user's lock),
+# so cache entries for older versions are simply never looked up again. Versions are
+# never reset, otherwise a stale entry could match a reused number.
+_data_versions = {}
+
+def _data_version(current_user):
+    return _data_versions.get(current_user, 0)
+
+def _bump_version(current_user):
+    _data_versions[current_user] = _data_versions.get(current_user, 0) + 1
+
+def cache_stats():
+    """Hit/miss counters and current size of the result cache."""
+    return result_cache.stats()
+
+def metrics_report():
+    """Summary text and per-handler table for the admin tab."""
+    if not metrics.ENABLED:
+        return "Instrumentation is off. Start the app with `HEALTHAPP_METRICS=1` to collect metrics.", pd.DataFrame()
+    cache = cache_stats()
+    lookups = cache['hits'] + cache['misses']
+    hit_rate = f"{cache['hits'] / lookups:.0%}" if lookups else "n/a"
+    io = metrics.snapshot()['histograms']
+    lines = [f"**Result cache:** {cache['size']} entries, {cache['hits']} hits / {lookups} lookups ({hit_rate})"]
+    for name in ('journal_flush', 'snapshot_write', 'record_load', 'compact', 'sqlite_read', 'sqlite_write'):
+        timing = io.get(f"io.{name}_ms")
+        if timing:
+            line = f"**{name}:** {timing['count']} calls, p50 {timing['p50']:.2f} ms, p99 {timing['p99']:.2f} ms"
+            if f"io.{name}_bytes" in io:
+                line += f", {io[f'io.{name}_bytes']['mean']:.0f} bytes on average"
+            lines.append(line)
+    return "\n\n".join(lines), metrics.handler_table()
 
 # --- Helper Functions ---
-def calculate_tdee(profile, weight):
-    """Calculates TDEE and BMR based on profile data and a specific weight."""
-    age, gender, height, activity_level = profile['age'], profile['gender'], profile['height'], profile['activity_level']
-
-    if gender == "Male":
-        bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
-    else:
-        bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
-
-    activity_multipliers = {"Sedentary": 1.2, "Lightly active": 1.375, "Moderately active": 1.55, "Very active": 1.725, "Extremely active": 1.9}
-    tdee = bmr * activity_multipliers.get(activity_level, 1.2)
-    return round(bmr), round(tdee)
-
 def get_daily_calories(current_user):
     """Aggregates calories by day for plotting."""
-    if not current_user or user_health_data[current_user]['food_log'].empty:
+    if not current_user:
         return pd.DataFrame(columns=['Date', 'Actual Intake'])
 
-    food_log = user_health_data[current_user]['food_log'].copy()
+    food_log = storage.get_food_log(current_user)
+    if food_log.empty:
+        return pd.DataFrame(columns=['Date', 'Actual Intake'])
+
+    food_log = food_log.copy()
     food_log['Date'] = pd.to_datetime(food_log['Date']).dt.date.astype(str)
     daily_calories = food_log.groupby('Date')['Calories'].sum().reset_index()
     daily_calories.columns = ['Date', 'Actual Intake']
     return daily_calories.sort_values(by='Date')
 
-def prepare_calorie_status_data(current_user):
-    """Prepares data for a single-bar calorie plot with conditional coloring."""
+# --- Input Validation ---
+# Largest values accepted from the UI or an import. Calories and TDEE are stored in
+# 32-bit columns; within these bounds no computed TDEE comes anywhere near that limit.
+MAX_ENTRY_CALORIES = 100000
+MAX_WEIGHT_KG = 1000
+MAX_HEIGHT_CM = 300
+MAX_AGE = 150
+
+def _in_range(value, low, high, low_inclusive=True):
+    """True if value is a number within [low, high] (or (low, high])."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return False
+    return (low <= value if low_inclusive else low < value) and value <= high
+
+def _calories_error(calories):
+    if not _in_range(calories, 0, MAX_ENTRY_CALORIES):
+        return f"Calories must be between 0 and {MAX_ENTRY_CALORIES}."
+
+def _weight_error(weight):
+    if not _in_range(weight, 0, MAX_WEIGHT_KG, low_inclusive=False):
+        return f"Weight must be more than 0 and at most {MAX_WEIGHT_KG} kg."
+
+def _profile_error(height, weight, age):
+    if not _in_range(height, 0, MAX_HEIGHT_CM, low_inclusive=False):
+        return f"Height must be more than 0 and at most {MAX_HEIGHT_CM} cm."
+    if not _in_range(age, 0, MAX_AGE, low_inclusive=False):
+        return f"Age must be more than 0 and at most {MAX_AGE}."
+    return _weight_error(weight)
+
+# --- Daily Calorie Aggregates ---
+class DailyCalorieTotals:
+    """Per-day calorie sums and logged TDEE goals for one user, updated incrementally."""
+
+    def __init__(self):
+        self.calories = {}  # 'YYYY-MM-DD' -> total intake that day
+        self.goals = {}     # 'YYYY-MM-DD' -> TDEE logged that day
+        self.dates = []     # sorted union of both key sets
+
+    def _touch(self, date):
+        # New entries are almost always for today, i.e. appended at the end.
+        if date not in self.calories and date not in self.goals:
+            if not self.dates or self.dates[-1] < date:
+                self.dates.append(date)
+            else:
+                bisect.insort(self.dates, date)
+
+    def add_food(self, date, calories):
+        self._touch(date)
+        self.calories[date] = self.calories.get(date, 0) + calories
+
+    def set_goal(self, date, tdee):
+        self._touch(date)
+        self.goals[date] = tdee
+
+    @classmethod
+    def from_logs(cls, daily_calories, bmi_history):
+        """Builds the aggregate from get_daily_calories output and a bmi_history frame."""
+        totals = cls()
+        for date, tdee in zip(bmi_history['Date'], bmi_history['TDEE']):
+            totals.set_goal(date, tdee)
+        for date, intake in zip(daily_calories['Date'], daily_calories['Actual Intake']):
+            totals.add_food(date, intake)
+        return totals
+
+    def __eq__(self, other):
+        return (self.calories, self.goals, self.dates) == (other.calories, other.goals, other.dates)
+
+    def status_rows(self, start=None):
+        """Yields (date, intake, goal) for days with intake on or after `start`.
+
+        The goal is the latest non-zero one logged on or before that day; only the days
+        from `start` on (plus the ones before it back to the last goal) are visited.
+        """
+        lo = 0 if start is None else bisect.bisect_left(self.dates, start)
+        goal = self._goal_before(lo)
+        for date in self.dates[lo:]:
+            if self.goals.get(date, 0) > 0:
+                goal = self.goals[date]
+            intake = self.calories.get(date, 0)
+            if intake > 0:
+                yield date, intake, goal
+
+    def _goal_before(self, i):
+        """The latest non-zero goal logged before dates[i]."""
+        for j in range(i - 1, -1, -1):
+            goal = self.goals.get(self.dates[j], 0)
+            if goal > 0:
+                return goal
+        return DEFAULT_TDEE_GOAL
+
+    def to_status_frame(self, start=None):
+        """Days with intake (from `start` on), each marked against the latest non-zero goal logged on or before it."""
+        rows = [(date, intake, 'Over Goal' if intake > goal else 'Under/On Goal')
+                for date, intake, goal in self.status_rows(start)]
+        return pd.DataFrame(rows, columns=['Date', 'Actual Calorie Intake', 'Status'])
+
+# username -> DailyCalorieTotals, built from the stored logs on first use.
+_daily_totals = UserStateCache()
+
+def _build_daily_totals(current_user):
+    return DailyCalorieTotals.from_logs(get_daily_calories(current_user), storage.get_bmi_history(current_user))
+
+def get_daily_totals(current_user):
+    """Returns the user's incrementally maintained aggregate.
+
+    Handlers fetch it *before* writing a new entry to storage; otherwise a first-time
+    build would already include the entry they are about to add.
+    """
+    with storage.user_lock(current_user):
+        totals = _daily_totals.get(current_user)
+        if totals is None:
+            totals = _daily_totals[current_user] = _build_daily_totals(current_user)
+        return totals
+
+def check_daily_totals(current_user):
+    """Rebuilds the aggregate from the raw logs. Returns True if the maintained one matched."""
+    with storage.user_lock(current_user):
+        rebuilt = _build_daily_totals(current_user)
+        consistent = _daily_totals.get(current_user, rebuilt) == rebuilt
+        _daily_totals[current_user] = rebuilt
+        if not consistent:
+            _bump_version(current_user)
+        return consistent
+
+@metrics.handler("prepare_calorie_status_data")
+def prepare_calorie_status_data(current_user, history_range=None):
+    """Prepares data for a single-bar calorie plot with conditional coloring.
+
+    `history_range` is one of HISTORY_RANGES; None means every day of the history.
+    """
     if not current_user:
         return pd.DataFrame(columns=['Date', 'Actual Calorie Intake', 'Status'])
 
-    tdee_history = user_health_data[current_user]['bmi_history'][['Date', 'TDEE']].copy()
-    tdee_history.rename(columns={'TDEE': 'TDEE (Goal)'}, inplace=True)
-
-    calorie_intake = get_daily_calories(current_user)
-    calorie_intake.rename(columns={'Actual Intake': 'Actual Calorie Intake'}, inplace=True)
-
-    comparison_df = pd.merge(tdee_history, calorie_intake, on='Date', how='outer').sort_values(by='Date').fillna(0)
-
-    comparison_df['TDEE (Goal)'] = comparison_df['TDEE (Goal)'].replace(0, np.nan).ffill()
-    comparison_df.fillna({'TDEE (Goal)': 2000}, inplace=True) # Default goal if none is ever set
-
-    comparison_df['Status'] = np.where(
-        (comparison_df['Actual Calorie Intake'] > comparison_df['TDEE (Goal)']) & (comparison_df['TDEE (Goal)'] > 0),
-        'Over Goal',
-        'Under/On Goal'
-    )
-
-    result_df = comparison_df[comparison_df['Actual Calorie Intake'] > 0]
-    return result_df[['Date', 'Actual Calorie Intake', 'Status']]
-
-def calculate_bmi(height, weight):
-    """Pure BMI calculation."""
-    if height > 0:
-        bmi = weight / ((height / 100) ** 2)
-    else:
-        bmi = 0
-
-    category = "Underweight"
-    if 18.5 <= bmi < 24.9:
-        category = "Normal"
-    elif 25 <= bmi < 29.9:
-        category = "Overweight"
-    elif bmi >= 30:
-        category = "Obese"
-    return f"{bmi:.1f}", category
+    def compute():
+        totals = get_daily_totals(current_user)
+        window = HISTORY_RANGES.get(history_range)
+        if isinstance(window, str):
+            return _rollup_calorie_status(totals, window)
+        return totals.to_status_frame(_window_start(window))
+
+    with storage.user_lock(current_user):
+        return result_cache.get_or_compute(
+            ('calorie_status', current_user, _data_version(current_user), _range_key(history_range)), compute)
+
+# --- History Windows ---
+# Range selector choices: a number of days back from today, or a pandas period
+# frequency for all-time weekly/monthly averages. Plots only ever receive the rows
+# inside the window (or one row per period).
+HISTORY_RANGES = {
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last 365 days": 365,
+    "All time (weekly averages)": "W",
+    "All time (monthly averages)": "M",
+}
+DEFAULT_HISTORY_RANGE = "Last 90 days"
+
+def _window_start(days):
+    if days is None:
+        return None
+    return (datetime.date.today() - datetime.timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+def _range_key(history_range):
+    """Result-cache key part for a range. Day windows move at midnight, so theirs
+    includes the window's first day."""
+    window = HISTORY_RANGES.get(history_range)
+    return history_range, None if isinstance(window, str) else _window_start(window)
+
+def _period_starts(dates, freq):
+    return pd.to_datetime(dates).dt.to_period(freq).dt.start_time.dt.strftime("%Y-%m-%d")
+
+def _rollup_calorie_status(totals, freq):
+    """Average daily intake and goal per period, over the days with intake."""
+    rows = pd.DataFrame(list(totals.status_rows()), columns=['Date', 'Intake', 'Goal'])
+    if rows.empty:
+        return pd.DataFrame(columns=['Date', 'Actual Calorie Intake', 'Status'])
+    means = rows.groupby(_period_starts(rows['Date'], freq))[['Intake', 'Goal']].mean()
+    return pd.DataFrame({
+        'Date': means.index,
+        'Actual Calorie Intake': means['Intake'].round().astype(int).values,
+        'Status': np.where(means['Intake'] > means['Goal'], 'Over Goal', 'Under/On Goal'),
+    })
+
+def get_bmi_history_view(current_user, history_range=DEFAULT_HISTORY_RANGE):
+    """The user's BMI history for a HISTORY_RANGES window, or averaged per week/month."""
+    if not current_user:
+        return pd.DataFrame(columns=BMI_HISTORY_COLUMNS)
+
+    def compute():
+        window = HISTORY_RANGES.get(history_range)
+        if not isinstance(window, str):
+            return storage.get_bmi_history(current_user, start=_window_start(window))
+        history = storage.get_bmi_history(current_user)
+        if history.empty:
+            return history
+        means = history.groupby(_period_starts(history['Date'], window))[['BMI', 'Weight', 'TDEE']].mean()
+        return means.round({'BMI': 1, 'Weight': 1}).astype({'TDEE': int}).rename_axis('Date').reset_index()
+
+    with storage.user_lock(current_user):
+        return result_cache.get_or_compute(
+            ('bmi_history', current_user, _data_version(current_user), _range_key(history_range)), compute)
+
+@metrics.handler("get_history_charts")
+def get_history_charts(current_user, history_range=DEFAULT_HISTORY_RANGE):
+    """Both Historical Graphs plots for the selected range."""
+    if not current_user:
+        return pd.DataFrame(), pd.DataFrame()
+    return get_bmi_history_view(current_user, history_range), prepare_calorie_status_data(current_user, history_range)
+
+# --- History Recompute ---
+RECOMPUTE_CHUNK_SIZE = 1000 # Users per vectorized pass in recompute_history
+
+def _recompute_rows(frames):
+    """Rewrites BMI/TDEE of concatenated history frames that carry profile columns."""
+    rows = pd.concat(frames, ignore_index=True)
+    bmi, _ = calculate_bmi_batch(rows['height'], rows['Weight'])
+    _, tdee = calculate_tdee_batch(rows['age'], rows['gender'], rows['height'], rows['Weight'], rows['activity_level'])
+    return rows.assign(BMI=np.round(bmi, 1), TDEE=tdee.astype(int))
+
+def _history_with_profile(username):
+    profile = storage.get_profile(username)
+    return storage.get_bmi_history(username).assign(
+        user=username, height=profile['height'], age=profile['age'],
+        gender=profile['gender'], activity_level=profile['activity_level'])
+
+@metrics.handler("recompute_history")
+def recompute_history(usernames=None):
+    """Recomputes the BMI and TDEE of stored bmi_history rows from each user's current profile.
+
+    Runs over all users when `usernames` is None, vectorized RECOMPUTE_CHUNK_SIZE users
+    at a time, with one batched write per user. A user who logs new data while their
+    chunk is being computed is recomputed again under their lock. Returns the number of
+    rows rewritten.
+    """
+    usernames = storage.list_users() if usernames is None else list(usernames)
+    rewritten = 0
+    for i in range(0, len(usernames), RECOMPUTE_CHUNK_SIZE):
+        chunk = usernames[i:i + RECOMPUTE_CHUNK_SIZE]
+        versions = {u: _data_version(u) for u in chunk}
+        frames = [f for f in (_history_with_profile(u) for u in chunk) if not f.empty]
+        if not frames:
+            continue
+        for username, rows in _recompute_rows(frames).groupby('user', sort=False):
+            with storage.user_lock(username):
+                if _data_version(username) != versions[username]:
+                    rows = _recompute_rows([_history_with_profile(username)])
+                storage.upsert_bmi(username, rows[BMI_HISTORY_COLUMNS].to_dict('records'))
+                _daily_totals.pop(username, None) # goals changed; rebuilt on next use
+                _bump_version(username)
+            rewritten += len(rows)
+    return rewritten
+
+# --- Food Log Pages ---
+FOOD_LOG_PAGE_SIZE = 20 # Entries per Food Tracker table page, most recently logged first
+
+def _food_log_page(current_user, page):
+    """Returns (page frame, page label, page number clamped to the existing pages)."""
+    total = storage.food_log_size(current_user)
+    pages = max(1, -(-total // FOOD_LOG_PAGE_SIZE))
+    page = min(max(int(page or 1), 1), pages)
+    frame = storage.get_food_log_page(current_user, (page - 1) * FOOD_LOG_PAGE_SIZE, FOOD_LOG_PAGE_SIZE)
+    return frame, f"Page {page} of {pages} · {total} entries", page
+
+@metrics.handler("get_food_log_page")
+def get_food_log_page(current_user, page=1):
+    """One page of the Food Tracker table, newest entries first."""
+    if not current_user:
+        return pd.DataFrame(columns=FOOD_LOG_COLUMNS), "", 1
+    with storage.user_lock(current_user):
+        return _food_log_page(current_user, page)
+
+def newer_food_log_page(current_user, page):
+    return get_food_log_page(current_user, (page or 1) - 1)
+
+def older_food_log_page(current_user, page):
+    return get_food_log_page(current_user, (page or 1) + 1)
+
+# --- Food Suggestions ---
+# username -> RecentFoods, seeded from the newest log entries on first use.
+_recent_foods = UserStateCache()
+
+def get_recent_foods(current_user):
+    """Returns the user's recent and frequent foods, seeding them from storage on first use."""
+    with storage.user_lock(current_user):
+        recent = _recent_foods.get(current_user)
+        if recent is None:
+            recent = _recent_foods[current_user] = RecentFoods()
+            database = get_food_database()
+            newest = storage.get_food_log_page(current_user, 0, 2 * RECENT_FOODS_SIZE)
+            for food, calories in zip(newest['Food'][::-1], newest['Calories'][::-1]):
+                if isinstance(food, str):
+                    recent.add(food, int(calories), database.find(food))
+        return recent
+
+def _suggestion_label(name, calories, serving=None, recent=False):
+    label = f"{name} · {calories} kcal" + (f" ({serving})" if serving else "")
+    return f"↺ {label}" if recent else label
+
+def _suggest(text, current_user, limit=SUGGESTION_LIMIT):
+    """(label, name) choices for `text`: the user's own matching foods first, then database matches."""
+    choices, seen = [], set()
+    if current_user:
+        for name, calories, _ in get_recent_foods(current_user).search(text, limit):
+            choices.append((_suggestion_label(name, calories, recent=True), name))
+            seen.add(name.lower())
+    database = get_food_database()
+    for food_id in database.search(text, limit):
+        name = database.names[food_id]
+        if len(choices) < limit and name.lower() not in seen:
+            choices.append((_suggestion_label(name, int(database.calories[food_id]), database.servings[food_id]), name))
+    return choices
+
+@metrics.handler("suggest_foods")
+def suggest_foods(text, current_user):
+    """Autocomplete choices for the food name typed so far."""
+    return gr.update(choices=_suggest(text, current_user), value=None)
+
+@metrics.handler("choose_food")
+def choose_food(choice, current_user):
+    """Fills in the food name and calories for a chosen suggestion.
+
+    A food the user logged before gets the calories they last logged for it; other
+    foods get the database's calories per serving.
+    """
+    if not choice:
+        return gr.update(), gr.update()
+    remembered = get_recent_foods(current_user).get(choice) if current_user else None
+    if remembered:
+        return remembered[0], remembered[1]
+    database = get_food_database()
+    food_id = database.find(choice)
+    if food_id is None:
+        return choice, gr.update()
+    return database.names[food_id], int(database.calories[food_id])
 
 # --- Core Functions (Authentication & Data Handling) ---
+@metrics.handler("register_user")
 def register_user(username, password, confirm_password):
     """Handles user registration."""
     if not username or not password or not confirm_password:
         return "Username and password cannot be empty."
     if password != confirm_password:
         return "Passwords do not match."
-    if username in user_health_data:
-        return "Username already exists. Please choose another one."
-
     hashed_password = _hash_password(password)
-    user_health_data[username] = {
-        'password': hashed_password,
-        'profile': {'height': 170, 'weight': 70, 'age': 25, 'gender': 'Male', 'activity_level': 'Moderately active'},
-        'bmi_history': pd.DataFrame(columns=['Date', 'BMI', 'Weight', 'TDEE']),
-        'food_log': pd.DataFrame(columns=['Date', 'Food', 'Calories'])
-    }
-    save_data(user_health_data)
+    default_profile = {'height': 170, 'weight': 70, 'age': 25, 'gender': 'Male', 'activity_level': 'Moderately active'}
+    if not storage.register(username, hashed_password, default_profile):
+        return "Username already exists. Please choose another one."
     return f"✅ Registration successful for **{username}**! You can now log in."
 
-def login_user(username, password):
+@metrics.handler("login_user")
+def login_user(username, password, history_range=DEFAULT_HISTORY_RANGE):
     """Handles user login and data loading."""
     if not username or not password:
-        return (None, gr.update(), gr.update(), "Please enter username and password.", pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 170, 70, 25, "Male", "Moderately active")
+        return (None, gr.update(), gr.update(), "Please enter username and password.", pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 170, 70, 25, "Male", "Moderately active", "", 1)
 
-    if username not in user_health_data or user_health_data[username]['password'] != _hash_password(password):
-        return (None, gr.update(), gr.update(), "❌ Invalid username or password.", pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 170, 70, 25, "Male", "Moderately active")
+    stored_password = storage.get_password(username)
+    if stored_password is None or stored_password != _hash_password(password):
+        return (None, gr.update(), gr.update(), "❌ Invalid username or password.", pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 170, 70, 25, "Male", "Moderately active", "", 1)
 
     welcome_msg = f"👋 Welcome back, **{username}**!"
-    user_profile = user_health_data[username]['profile']
-    user_food_log = user_health_data[username]['food_log']
-
-    _, tdee_val = calculate_tdee(user_profile, user_profile['weight'])
-    today = datetime.date.today().strftime("%Y-%m-%d")
-
-    history_df = user_health_data[username]['bmi_history']
-    if history_df.empty or today not in history_df['Date'].values:
-        bmi_val_str, _ = calculate_bmi(user_profile['height'], user_profile['weight'])
-        new_entry = pd.DataFrame({
-            'Date': [today], 'BMI': [float(bmi_val_str)],
-            'Weight': [user_profile['weight']], 'TDEE': [tdee_val]
-        })
-        updated_history = pd.concat([history_df, new_entry], ignore_index=True)
-        user_health_data[username]['bmi_history'] = updated_history
-        save_data(user_health_data)
-
-    updated_history = user_health_data[username]['bmi_history']
-    calorie_status_data = prepare_calorie_status_data(username)
+    with storage.user_lock(username):
+        user_profile = storage.get_profile(username)
+        today = datetime.date.today().strftime("%Y-%m-%d")
+
+        if storage.get_bmi_history(username, start=today, end=today).empty:
+            _, tdee_val = calculate_tdee(user_profile, user_profile['weight'])
+            get_daily_totals(username).set_goal(today, tdee_val)
+            storage.upsert_bmi(username, [{
+                'Date': today, 'BMI': calculate_bmi_value(user_profile['height'], user_profile['weight']),
+                'Weight': user_profile['weight'], 'TDEE': tdee_val
+            }])
+            _bump_version(username)
+
+        user_food_log, page_label, updated_history, calorie_status_data = result_cache.get_or_compute(
+            ('login', username, _data_version(username), _range_key(history_range)),
+            lambda: _food_log_page(username, 1)[:2] + get_history_charts(username, history_range))
 
     return (
         username, gr.update(visible=False), gr.update(visible=True), welcome_msg,
         user_food_log,
         updated_history, calorie_status_data,
         user_profile['height'], user_profile['weight'], user_profile['age'],
-        user_profile['gender'], user_profile['activity_level']
+        user_profile['gender'], user_profile['activity_level'],
+        page_label, 1
     )
 
-def logout():
+@metrics.handler("logout")
+def logout(current_user=None):
     """Handles user logout and UI reset."""
+    if current_user:
+        with storage.user_lock(current_user):
+            _daily_totals.pop(current_user, None)
+            _recent_foods.pop(current_user, None)
+            storage.release(current_user)
     return (
         None, gr.update(visible=True), gr.update(visible=False), "",
         pd.DataFrame(), pd.DataFrame(), pd.DataFrame(),
         170, 70, 25, "Male", "Moderately active",
         70, "", 0, "", "",
         "", "", "", "", "", "",
-        "Profile saved successfully!"
+        "Profile saved successfully!",
+        "", 1
     )
 
+@metrics.handler("save_profile")
 def save_profile(height, weight, age, gender, activity_level, current_user):
     """Saves user's profile information."""
     if not current_user: return "Please log in first."
+    error = _profile_error(height, weight, age)
+    if error: return error
 
-    user_health_data[current_user]['profile'] = {
-        'height': height, 'weight': weight, 'age': age,
-        'gender': gender, 'activity_level': activity_level
-    }
-    save_data(user_health_data)
+    with storage.user_lock(current_user):
+        storage.save_profile(current_user, {
+            'height': height, 'weight': weight, 'age': age,
+            'gender': gender, 'activity_level': activity_level
+        })
+        _bump_version(current_user)
+        # Height, age, gender and activity feed every logged TDEE goal.
+        recompute_history([current_user])
     return f"{current_user}'s profile has been saved!"
 
-def update_bmi(current_weight, current_user):
+@metrics.handler("update_bmi")
+def update_bmi(current_weight, current_user, history_range=DEFAULT_HISTORY_RANGE):
     """Calculates and logs BMI and TDEE, then updates all charts."""
     if not current_user: return None, "Please log in first.", pd.DataFrame(), pd.DataFrame(), 0
+    error = _weight_error(current_weight)
+    if error: return None, error, gr.update(), gr.update(), gr.update()
 
-    profile = user_health_data[current_user]['profile']
-    height = profile['height']
-
-    bmi_val_str, category = calculate_bmi(height, current_weight)
-    _, tdee_val = calculate_tdee(profile, current_weight)
+    # The profile is read, modified and written back, so hold the user's lock throughout.
+    with storage.user_lock(current_user):
+        profile = storage.get_profile(current_user)
+        height = profile['height']
 
-    user_health_data[current_user]['profile']['weight'] = current_weight
+        bmi_val_str, category = calculate_bmi(height, current_weight)
+        _, tdee_val = calculate_tdee(profile, current_weight)
 
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    new_entry = pd.DataFrame({'Date': [today], 'BMI': [float(bmi_val_str)], 'Weight': [current_weight], 'TDEE': [tdee_val]})
+        storage.save_profile(current_user, dict(profile, weight=current_weight))
 
-    history_df = user_health_data[current_user]['bmi_history']
-    updated_history = pd.concat([history_df, new_entry], ignore_index=True)
-    updated_history = updated_history.drop_duplicates(subset=['Date'], keep='last').sort_values(by='Date')
-    user_health_data[current_user]['bmi_history'] = updated_history
-    save_data(user_health_data)
-
-    calorie_status_data = prepare_calorie_status_data(current_user)
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        get_daily_totals(current_user).set_goal(today, tdee_val)
+        storage.upsert_bmi(current_user, [{'Date': today, 'BMI': calculate_bmi_value(height, current_weight), 'Weight': current_weight, 'TDEE': tdee_val}])
+        _bump_version(current_user)
+        updated_history, calorie_status_data = get_history_charts(current_user, history_range)
 
     return bmi_val_str, category, updated_history, calorie_status_data, current_weight
 
-def add_food(food, calories, current_user):
-    """Logs a food item and updates the comparison charts."""
-    if not current_user: return pd.DataFrame(), pd.DataFrame()
+@metrics.handler("add_food")
+def add_food(food, calories, current_user, history_range=DEFAULT_HISTORY_RANGE, page=1):
+    """Logs a food item and updates the comparison charts and the visible Food Log page."""
+    if not current_user: return pd.DataFrame(), pd.DataFrame(), "", 1
+    error = _calories_error(calories)
+    if error:
+        gr.Warning(error)
+        return gr.update(), gr.update(), gr.update(), gr.update()
 
     today = datetime.date.today().strftime("%Y-%m-%d")
-    new_entry = pd.DataFrame({'Date': [today], 'Food': [food], 'Calories': [int(calories)]})
-
-    user_health_data[current_user]['food_log'] = pd.concat(
-        [user_health_data[current_user]['food_log'], new_entry], ignore_index=True)
-    save_data(user_health_data)
-
-    updated_food_log = user_health_data[current_user]['food_log']
-    calorie_status_data = prepare_calorie_status_data(current_user)
-
-    return updated_food_log, calorie_status_data
-
+    # The entry keeps the name as typed; the database ID only links it to its suggestion.
+    food_id = get_food_database().find(food)
+    with storage.user_lock(current_user):
+        get_daily_totals(current_user).add_food(today, int(calories))
+        recent = _recent_foods.get(current_user) # otherwise seeded from storage when first needed
+        if recent is not None:
+            recent.add(food, int(calories), food_id)
+        storage.append_food(current_user, [{'Date': today, 'Food': food, 'Calories': int(calories)}])
+        _bump_version(current_user)
+
+        updated_food_log, page_label, page = _food_log_page(current_user, page)
+        calorie_status_data = prepare_calorie_status_data(current_user, history_range)
+
+    return updated_food_log, calorie_status_data, page_label, page
+
+@metrics.handler("calculate_bmr_tdee_for_display")
 def calculate_bmr_tdee_for_display(current_user):
     """Calculates BMR/TDEE for display using current profile data."""
     if not current_user: return "N/A", "N/A", "N/A", "N/A", "N/A", "Please log in first."
 
-    profile = user_health_data[current_user]['profile']
-    bmr, tdee = calculate_tdee(profile, profile['weight'])
+    def compute():
+        profile = storage.get_profile(current_user)
+        bmr, tdee = calculate_tdee(profile, profile['weight'])
 
-    info_text = f"Calculated based on: Age {profile['age']}, Height {profile['height']} cm, Weight {profile['weight']} kg, Gender {profile['gender']}"
+        info_text = f"Calculated based on: Age {profile['age']}, Height {profile['height']} cm, Weight {profile['weight']} kg, Gender {profile['gender']}"
 
-    return (
-        f"{bmr} calories/day", f"{tdee} calories/day",
-        f"{tdee - 500} calories/day", f"{tdee} calories/day", f"{tdee + 500} calories/day",
-        info_text
-    )
+        return (
+            f"{bmr} calories/day", f"{tdee} calories/day",
+            f"{tdee - 500} calories/day", f"{tdee} calories/day", f"{tdee + 500} calories/day",
+            info_text
+        )
+
+    return result_cache.get_or_compute(('bmr_tdee', current_user, _data_version(current_user)), compute)
 
+
+# --- Bulk Import / Export ---
+IMPORT_CHUNK_SIZE = 5000 # Rows parsed, validated and persisted per batch
+EXPORT_COLUMNS = ['Date', 'Food', 'Calories', 'Weight'] # Also the import format
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson', '.json')
+
+def _read_chunks(file_path):
+    """Streams a CSV or JSON Lines file as DataFrames of IMPORT_CHUNK_SIZE rows."""
+    if file_path.lower().endswith(JSON_LINES_EXTENSIONS):
+        reader = pd.read_json(file_path, lines=True, chunksize=IMPORT_CHUNK_SIZE, dtype=False)
+    else:
+        reader = pd.read_csv(file_path, chunksize=IMPORT_CHUNK_SIZE, dtype=str, keep_default_na=False)
+    with reader:
+        yield from reader
+
+def _normalize_chunk(chunk):
+    """Splits a raw chunk into valid food rows and weight rows.
+
+    Column names are matched case-insensitively. Dates are normalized to YYYY-MM-DD,
+    calories must be numbers in 0..MAX_ENTRY_CALORIES and weights in (0, MAX_WEIGHT_KG].
+    Returns (food rows frame, weight rows frame, number of rejected rows).
+    """
+    chunk = chunk.rename(columns=lambda c: str(c).strip().capitalize())
+    empty = pd.Series(np.nan, index=chunk.index)
+    dates = pd.to_datetime(chunk.get('Date', empty), errors='coerce', format='mixed').dt.strftime('%Y-%m-%d')
+    foods = chunk.get('Food', empty).astype(str).str.strip()
+    calories = pd.to_numeric(chunk.get('Calories', empty), errors='coerce')
+    weights = pd.to_numeric(chunk.get('Weight', empty), errors='coerce')
+
+    has_food = (dates.notna() & calories.between(0, MAX_ENTRY_CALORIES) & foods.ne('')
+                & chunk.get('Food', empty).notna())
+    has_weight = dates.notna() & weights.gt(0) & weights.le(MAX_WEIGHT_KG)
+    food_rows = pd.DataFrame({'Date': dates[has_food], 'Food': foods[has_food],
+                              'Calories': calories[has_food].round().astype(int)})
+    weight_rows = pd.DataFrame({'Date': dates[has_weight], 'Weight': weights[has_weight]})
+    return food_rows, weight_rows, int((~(has_food | has_weight)).sum())
+
+@metrics.handler("import_history")
+def import_history(file_path, current_user, history_range=DEFAULT_HISTORY_RANGE):
+    """Bulk-imports food and weight rows from an uploaded CSV or JSON Lines file.
+
+    The file is streamed in IMPORT_CHUNK_SIZE chunks with one storage write per log per
+    chunk; BMI and TDEE for the weight rows are computed in batch from the saved profile,
+    and the derived daily totals are rebuilt once at the end.
+    """
+    if not current_user:
+        return "Please log in first.", pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), "", 1
+    if not file_path:
+        return "Please choose a file to import.", gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+
+    foods_added = weights_added = skipped = 0
+    with storage.user_lock(current_user):
+        profile = storage.get_profile(current_user)
+        try:
+            for chunk in _read_chunks(file_path):
+                food_rows, weight_rows, rejected = _normalize_chunk(chunk)
+                skipped += rejected
+                if not food_rows.empty:
+                    storage.append_food(current_user, food_rows.to_dict('records'))
+                    foods_added += len(food_rows)
+                if not weight_rows.empty:
+                    # Later rows for the same date win, as with repeated logging on one day.
+                    weight_rows = weight_rows.drop_duplicates(subset='Date', keep='last')
+                    n = len(weight_rows)
+                    bmi, _ = calculate_bmi_batch(np.full(n, profile['height']), weight_rows['Weight'])
+                    _, tdee = calculate_tdee_batch(
+                        np.full(n, profile['age']), np.full(n, profile['gender'], dtype=object),
+                        np.full(n, profile['height']), weight_rows['Weight'],
+                        np.full(n, profile['activity_level'], dtype=object))
+                    storage.upsert_bmi(current_user, weight_rows.assign(
+                        BMI=np.round(bmi, 1), TDEE=tdee.astype(int))[BMI_HISTORY_COLUMNS].to_dict('records'))
+                    weights_added += n
+        except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+            message = f"❌ Import stopped: could not read the file ({e})."
+        else:
+            message = f"✅ Imported {foods_added} food entries and {weights_added} weight entries."
+        if skipped:
+            message += f" Skipped {skipped} invalid rows."
+
+        if foods_added or weights_added:
+            _daily_totals.pop(current_user, None) # rebuilt once from the stored logs
+            _recent_foods.pop(current_user, None)
+            _bump_version(current_user)
+        food_log, page_label, _ = _food_log_page(current_user, 1)
+        bmi_history, calorie_status_data = get_history_charts(current_user, history_range)
+
+    return message, food_log, bmi_history, calorie_status_data, page_label, 1
+
+@metrics.handler("export_history")
+def export_history(current_user):
+    """Streams the user's food log and weight history to a CSV file and returns its path.
+
+    Rows are written chunk by chunk in the import format, so the file can be re-imported.
+    """
+    if not current_user:
+        return None
+    # Usernames are free text; keep only safe characters so the name can't leave the temp folder.
+    safe_name = re.sub(r'[^A-Za-z0-9_-]', '_', current_user)[:40]
+    fd, path = tempfile.mkstemp(prefix=f"{safe_name}_history_", suffix=".csv")
+    with storage.user_lock(current_user), os.fdopen(fd, 'w', newline='') as f:
+        pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(f, index=False)
+        for chunk in storage.iter_food_log(current_user, IMPORT_CHUNK_SIZE):
+            chunk.reindex(columns=EXPORT_COLUMNS).to_csv(f, index=False, header=False)
+        for chunk in storage.iter_bmi_history(current_user, IMPORT_CHUNK_SIZE):
+            chunk.reindex(columns=EXPORT_COLUMNS).to_csv(f, index=False, header=False)
+    return path
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import bisect
+import logging
+import functools
+import threading
+import pandas as pd
+
+# --- Settings ---
+# Instrumentation is opt-in and decided at startup: with HEALTHAPP_METRICS unset the
+# decorators below return the functions unchanged and the record_* helpers return
+# immediately, so the disabled cost is a single flag check at a few call sites.
+ENABLED = os.environ.get("HEALTHAPP_METRICS", "") not in ("", "0")
+
+# Seconds between structured summary lines written to the "healthapp.metrics" logger (0 = never).
+LOG_INTERVAL = float(os.environ.get("HEALTHAPP_METRICS_LOG_INTERVAL", 60))
+
+MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BYTES_BUCKETS = tuple(64 * 4 ** i for i in range(12))  # 64 B .. 256 MB
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+logger = logging.getLogger("healthapp.metrics")
+
+
+# --- Histograms ---
+class Histogram:
+    """Fixed-bucket histogram; percentiles are estimated from the bucket bounds."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (the max for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                'max': self.max,
+            }
+
+_histograms = {}
+_counters = {}
+_registry_lock = threading.Lock()
+
+def _histogram(name, bounds):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(name, Histogram(bounds))
+    return histogram
+
+def _count(name, n=1):
+    with _registry_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+# --- Per-Call Accounting ---
+class _Call:
+    __slots__ = ('persistence', 'bytes', 'rows', 'cache_hits')
+
+    def __init__(self):
+        self.persistence = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.cache_hits = 0
+
+_current = threading.local()
+
+def _active_call():
+    return getattr(_current, 'call', None)
+
+def handler(name):
+    """Decorator recording wall time, persistence time, bytes, rows and cache hits per call.
+
+    Nested instrumented calls (e.g. save_profile -> recompute_history) are counted
+    toward the outermost handler only.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active_call() is not None:
+                return fn(*args, **kwargs)
+            call = _current.call = _Call()
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                _count(f"handler.{name}.errors")
+                raise
+            finally:
+                _current.call = None
+                _histogram(f"handler.{name}.wall_ms", MS_BUCKETS).observe((time.perf_counter() - started) * 1000)
+                _histogram(f"handler.{name}.persistence_ms", MS_BUCKETS).observe(call.persistence * 1000)
+                _histogram(f"handler.{name}.bytes", BYTES_BUCKETS).observe(call.bytes)
+                _histogram(f"handler.{name}.rows", ROWS_BUCKETS).observe(call.rows)
+                _count(f"handler.{name}.calls")
+                _count(f"handler.{name}.cache_hits", call.cache_hits)
+        return wrapper
+    return decorate
+
+def persistence(name):
+    """Decorator marking a function as storage I/O (disk, SQLite or (un)pickling).
+
+    Its time goes to the io.<name>_ms histogram and to the persistence time of the
+    handler call it runs in, if any. Calls nested in another persistence function
+    count toward the outer one only.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_current, 'in_io', False):
+                return fn(*args, **kwargs)
+            _current.in_io = True
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current.in_io = False
+                elapsed = time.perf_counter() - started
+                _histogram(f"io.{name}_ms", MS_BUCKETS).observe(elapsed * 1000)
+                call = _active_call()
+                if call is not None:
+                    call.persistence += elapsed
+        return wrapper
+    return decorate
+
+def record_bytes(name, n):
+    """Counts n bytes serialized or read by storage operation `name`."""
+    if not ENABLED:
+        return
+    _histogram(f"io.{name}_bytes", BYTES_BUCKETS).observe(n)
+    call = _active_call()
+    if call is not None:
+        call.bytes += n
+
+def record_rows(n):
+    """Counts n log rows read or written by the current handler call."""
+    if not ENABLED:
+        return
+    call = _active_call()
+    if call is not None:
+        call.rows += n
+
+def record_cache(hit):
+    if not ENABLED:
+        return
+    _count("cache.hits" if hit else "cache.misses")
+    call = _active_call()
+    if call is not None and hit:
+        call.cache_hits += 1
+
+
+# --- Reporting ---
+def snapshot():
+    """All histogram summaries and counters as one JSON-serializable dict."""
+    with _registry_lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+    return {'histograms': {name: h.summary() for name, h in sorted(histograms.items())},
+            'counters': dict(sorted(counters.items()))}
+
+def handler_table():
+    """One row per handler: calls, cache hits, p50/p99 of wall and persistence time, mean bytes and rows."""
+    data = snapshot()
+    names = sorted({key.split('.')[1] for key in data['counters'] if key.startswith('handler.')})
+    rows = []
+    for name in names:
+        wall = data['histograms'].get(f"handler.{name}.wall_ms", {})
+        io = data['histograms'].get(f"handler.{name}.persistence_ms", {})
+        data_bytes = data['histograms'].get(f"handler.{name}.bytes", {})
+        data_rows = data['histograms'].get(f"handler.{name}.rows", {})
+        rows.append((
+            name, data['counters'].get(f"handler.{name}.calls", 0),
+            data['counters'].get(f"handler.{name}.errors", 0),
+            data['counters'].get(f"handler.{name}.cache_hits", 0),
+            round(wall.get('p50', 0), 2), round(wall.get('p99', 0), 2), round(wall.get('max', 0), 2),
+            round(io.get('p50', 0), 2), round(io.get('p99', 0), 2),
+            int(data_bytes.get('mean', 0)), int(data_rows.get('mean', 0)),
+        ))
+    return pd.DataFrame(rows, columns=['Handler', 'Calls', 'Errors', 'Cache Hits', 'Wall p50 (ms)',
+                                       'Wall p99 (ms)', 'Wall max (ms)', 'I/O p50 (ms)', 'I/O p99 (ms)',
+                                       'Avg Bytes', 'Avg Rows'])
+
+def reset():
+    with _registry_lock:
+        _histograms.clear()
+        _counters.clear()
+
+_reporter = None
+
+def _report_loop(interval):
+    while True:
+        time.sleep(interval)
+        logger.info(json.dumps({'event': 'metrics', **snapshot()}))
+
+def start_reporter(interval=LOG_INTERVAL):
+    """Starts logging a structured summary line every `interval` seconds (once per process)."""
+    global _reporter
+    if not ENABLED or interval <= 0 or _reporter is not None:
+        return
+    if not logger.handlers and not logging.getLogger().handlers:
+        logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+    _reporter = threading.Thread(target=_report_loop, args=(interval,), name="metrics-reporter", daemon=True)
+    _reporter.start()
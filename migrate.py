@@ -0,0 +1,26 @@
+import argparse
+from datamanager import (DATA_FILE, SQLITE_FILE, COLUMNAR_FILE, migrate_pickle_to_sqlite,
+                         convert_pickle_to_columnar, check_columnar_snapshot)
+
+# Converts an existing user_health_data.pkl into the SQLite backend (afterwards, start
+# the app with HEALTHAPP_STORAGE=sqlite to use it), or into a columnar snapshot for
+# offline tools such as `python analytics.py --backend columnar`.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate pickled user data to SQLite or a columnar snapshot.")
+    parser.add_argument("--format", choices=["sqlite", "columnar"], default="sqlite", help="What to convert to.")
+    parser.add_argument("--source", default=DATA_FILE, help="Pickle snapshot to read.")
+    parser.add_argument("--target", help="Database or snapshot to write (default: the app's file for --format).")
+    args = parser.parse_args()
+
+    if args.format == "sqlite":
+        target = args.target or SQLITE_FILE
+        count = migrate_pickle_to_sqlite(args.source, target)
+        print(f"Migrated {count} user(s) from {args.source} to {target}.")
+    else:
+        target = args.target or COLUMNAR_FILE
+        count = convert_pickle_to_columnar(args.source, target)
+        mismatched = check_columnar_snapshot(args.source, target)
+        print(f"Converted {count} user(s) from {args.source} to {target}.")
+        if mismatched:
+            raise SystemExit(f"Round-trip check failed for {len(mismatched)} user(s): {', '.join(mismatched[:10])}")
+        print("Round-trip check passed: every user matches the source.")
@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# datamanager picks its data folder at import, so point it at a scratch folder before
+# any test imports the app modules.
+os.environ["HEALTHAPP_DATA_DIR"] = tempfile.mkdtemp(prefix="healthapp-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datamanager
+import logic
+
+
+@pytest.fixture(params=["pickle", "sqlite"])
+def storage(request, tmp_path):
+    """A fresh backend of each kind in its own folder, installed as the app's storage."""
+    path = tmp_path / ("data.pkl" if request.param == "pickle" else "data.sqlite3")
+    backend = (datamanager.PickleBackend if request.param == "pickle" else datamanager.SQLiteBackend)(str(path))
+    previous = logic.storage
+    datamanager._storage = logic.storage = backend
+    logic.result_cache.clear()
+    logic._daily_totals.clear()
+    logic._recent_foods.clear()
+    yield backend
+    backend.close()
+    datamanager._storage = logic.storage = previous
+    logic.result_cache.clear()
+    logic._daily_totals.clear()
+    logic._recent_foods.clear()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from calculations import (
+    ACTIVITY_MULTIPLIERS, BMI_CATEGORIES, calculate_bmi, calculate_bmi_batch, calculate_tdee, calculate_tdee_batch
+)
+
+SAMPLES = 10000
+
+
+@pytest.fixture
+def inputs():
+    rng = np.random.default_rng(0)
+    return {
+        'heights': rng.uniform(-10, 220, SAMPLES).round(1),
+        'weights': rng.uniform(20, 200, SAMPLES).round(1),
+        'ages': rng.integers(10, 101, SAMPLES),
+        'genders': rng.choice(["Male", "Female"], SAMPLES),
+        'levels': rng.choice(list(ACTIVITY_MULTIPLIERS) + ["Unknown"], SAMPLES),
+    }
+
+def test_bmi_batch_matches_scalar(inputs):
+    bmi, codes = calculate_bmi_batch(inputs['heights'], inputs['weights'])
+    for i in range(SAMPLES):
+        assert (f"{bmi[i]:.1f}", BMI_CATEGORIES[codes[i]]) == calculate_bmi(inputs['heights'][i], inputs['weights'][i])
+
+def test_bmi_batch_category_boundaries():
+    # Weights at 100 cm land exactly on the category thresholds, including the gaps between them.
+    weights = [18.4, 18.5, 24.9, 24.95, 25, 29.9, 29.95, 30]
+    _, codes = calculate_bmi_batch([100] * len(weights), weights)
+    assert [BMI_CATEGORIES[c] for c in codes] == [calculate_bmi(100, w)[1] for w in weights]
+
+def test_tdee_batch_matches_scalar(inputs):
+    bmr, tdee = calculate_tdee_batch(inputs['ages'], inputs['genders'], inputs['heights'], inputs['weights'],
+                                     inputs['levels'])
+    for i in range(SAMPLES):
+        profile = {'age': inputs['ages'][i], 'gender': inputs['genders'][i], 'height': inputs['heights'][i],
+                   'activity_level': inputs['levels'][i]}
+        assert (bmr[i], tdee[i]) == calculate_tdee(profile, inputs['weights'][i])
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+import datamanager
+
+PROFILE = {'height': 170, 'weight': 70, 'age': 25, 'gender': 'Male', 'activity_level': 'Moderately active'}
+
+
+@pytest.fixture
+def pickle_store(tmp_path):
+    """A small pickle store: database and free-text foods, one compacted user, one empty user."""
+    data_file = str(tmp_path / "data.pkl")
+    store = datamanager.PickleBackend(data_file, background=False)
+    for username in ("alice", "bob", "empty"):
+        store.register(username, f"hash-{username}", dict(PROFILE, age=len(username)))
+    store.append_food("alice", [
+        {'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 95},
+        {'Date': '2024-01-01', 'Food': 'Grandma’s lasagne', 'Calories': 640},
+        {'Date': '2024-01-02', 'Food': 'Banana', 'Calories': 105},
+        {'Date': '2024-01-03', 'Food': 'Grandma’s lasagne', 'Calories': 600},
+    ])
+    store.upsert_bmi("alice", [{'Date': '2024-01-01', 'BMI': 24.2, 'Weight': 70.0, 'TDEE': 2500},
+                               {'Date': '2024-01-03', 'BMI': 24.0, 'Weight': 69.4, 'TDEE': 2490}])
+    store.append_food("bob", [{'Date': '2023-12-31', 'Food': 'Tea', 'Calories': 0}])
+    store.compact()
+    # Journal-only changes on top of the compacted snapshot are converted too.
+    store.append_food("bob", [{'Date': '2024-01-01', 'Food': 'Orange', 'Calories': 62}])
+    store.upsert_bmi("bob", [{'Date': '2024-01-01', 'BMI': 31.1, 'Weight': 90.0, 'TDEE': 2900}])
+    store.flush()
+    yield store
+    store.close()
+
+def test_columnar_snapshot_round_trips(pickle_store, tmp_path):
+    columnar_file = str(tmp_path / "data.hcol")
+    assert datamanager.convert_pickle_to_columnar(pickle_store.data_file, columnar_file) == 3
+    assert datamanager.check_columnar_snapshot(pickle_store.data_file, columnar_file) == []
+
+    snapshot = datamanager.ColumnarSnapshot(columnar_file)
+    try:
+        assert sorted(snapshot.list_users()) == ["alice", "bob", "empty"]
+        for username in snapshot.list_users():
+            assert snapshot.get_password(username) == f"hash-{username}"
+            assert snapshot.get_profile(username) == pickle_store.get_profile(username)
+            pd.testing.assert_frame_equal(snapshot.get_food_log(username), pickle_store.get_food_log(username))
+            pd.testing.assert_frame_equal(snapshot.get_bmi_history(username), pickle_store.get_bmi_history(username))
+        assert snapshot.get_password("nobody") is None
+        assert snapshot.get_food_log("empty").empty
+    finally:
+        snapshot.close()
+
+def test_columnar_scan_views_the_mapping(pickle_store, tmp_path):
+    columnar_file = str(tmp_path / "data.hcol")
+    datamanager.convert_pickle_to_columnar(pickle_store.data_file, columnar_file)
+    snapshot = datamanager.ColumnarSnapshot(columnar_file)
+    try:
+        food = snapshot.scan('food')
+        offsets = food.pop('offsets')
+        assert offsets[0] == 0 and offsets[-1] == 6
+        # Columns are views of the memory-mapped file, not copies.
+        assert all(not column.flags.owndata and not column.flags.writeable for column in food.values())
+        i = snapshot.position("alice")
+        assert np.array_equal(food['calories'][offsets[i]:offsets[i + 1]], [95, 640, 105, 600])
+    finally:
+        del food
+        snapshot.close()
+
+def test_columnar_snapshot_rejects_newer_versions(tmp_path):
+    path = str(tmp_path / "data.hcol")
+    datamanager.write_columnar_snapshot(path, [])
+    with open(path, "r+b") as f:
+        magic, _, footer_offset, footer_length = datamanager.COLUMNAR_HEADER.unpack(
+            f.read(datamanager.COLUMNAR_HEADER.size))
+        f.seek(0)
+        f.write(datamanager.COLUMNAR_HEADER.pack(magic, datamanager.COLUMNAR_VERSION + 1, footer_offset, footer_length))
+    with pytest.raises(ValueError):
+        datamanager.ColumnarSnapshot(path)
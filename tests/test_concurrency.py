@@ -0,0 +1,69 @@
+import random
+import threading
+import datamanager
+import logic
+
+THREADS = 8
+OPS_PER_THREAD = 40
+USERS = ["alice", "bob", "carol"]
+
+
+def _reopen(storage):
+    """A second view of the same store, so the check covers what reached the disk."""
+    if isinstance(storage, datamanager.PickleBackend):
+        return datamanager.PickleBackend(storage.data_file, background=False, read_only=True)
+    return datamanager.SQLiteBackend(storage.db_file)
+
+def test_concurrent_handlers_lose_no_updates(storage):
+    for username in USERS:
+        logic.register_user(username, "secret", "secret")
+    added = {username: 0 for username in USERS}
+    added_lock = threading.Lock()
+    errors = []
+
+    def worker(k):
+        rng = random.Random(k)
+        try:
+            for i in range(OPS_PER_THREAD):
+                username = rng.choice(USERS)
+                if i % 5 == 0:
+                    logic.update_bmi(round(rng.uniform(50, 110), 1), username)
+                else:
+                    logic.add_food(f"Snack {k}-{i}", rng.randint(1, 900), username)
+                    with added_lock:
+                        added[username] += 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    storage.flush()
+
+    assert not errors
+    for username in USERS:
+        assert len(storage.get_food_log(username)) == added[username]
+        assert logic.check_daily_totals(username)
+    reopened = _reopen(storage)
+    try:
+        for username in USERS:
+            assert len(reopened.get_food_log(username)) == added[username]
+            assert len(reopened.get_bmi_history(username)) == len(storage.get_bmi_history(username))
+    finally:
+        reopened.close()
+
+def test_concurrent_weigh_ins_keep_one_row_per_day(storage):
+    logic.register_user("dave", "secret", "secret")
+    weights = [60 + k for k in range(THREADS)]
+    threads = [threading.Thread(target=logic.update_bmi, args=(w, "dave")) for w in weights]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    history = storage.get_bmi_history("dave")
+    assert len(history) == 1
+    # The profile and today's row are written under one lock, so they agree on the last writer.
+    assert history['Weight'].iloc[0] == storage.get_profile("dave")['weight']
@@ -0,0 +1,23 @@
+import pickle
+import pytest
+from healthlog import FoodLog, BMIHistory
+
+
+def test_food_log_keeps_names_as_typed():
+    log = FoodLog()
+    log.extend([{'Date': '2024-01-01', 'Food': 'apple', 'Calories': 95},
+                {'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 95},
+                {'Date': '2024-01-02', 'Food': 'apple', 'Calories': 90}])
+    assert log.to_frame()['Food'].tolist() == ['apple', 'Apple', 'apple']
+    assert log.food_names() == ['apple', 'Apple']
+    restored = pickle.loads(pickle.dumps(log))
+    assert restored.to_frame().equals(log.to_frame())
+
+def test_food_log_rejects_calories_outside_int32():
+    log = FoodLog()
+    with pytest.raises(ValueError):
+        log.extend([{'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 95},
+                    {'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 2 ** 31}])
+    assert len(log) == 0
+    with pytest.raises(ValueError):
+        BMIHistory().upsert('2024-01-01', 24.0, 70.0, float('nan'))
@@ -0,0 +1,22 @@
+import datetime
+import logic
+
+
+TOMORROW = datetime.date.today() + datetime.timedelta(days=1)
+
+
+class _Tomorrow(datetime.date):
+    @classmethod
+    def today(cls):
+        return TOMORROW
+
+def test_day_windows_move_at_midnight(storage, monkeypatch):
+    logic.register_user("alice", "secret", "secret")
+    today = datetime.date.today()
+    storage.upsert_bmi("alice", [{'Date': (today - datetime.timedelta(days=29)).isoformat(), 'BMI': 24.2,
+                                  'Weight': 70.0, 'TDEE': 2500}])
+    assert len(logic.get_bmi_history_view("alice", "Last 30 days")) == 1
+
+    # The next day, with no new writes, the 30-day window no longer includes that row.
+    monkeypatch.setattr(logic.datetime, "date", _Tomorrow)
+    assert logic.get_bmi_history_view("alice", "Last 30 days").empty
@@ -0,0 +1,43 @@
+import threading
+import pytest
+import datamanager
+
+
+def test_failed_journal_flush_is_retried(tmp_path, monkeypatch):
+    data_file = str(tmp_path / "data.pkl")
+    storage = datamanager.PickleBackend(data_file, background=False)
+    storage.register("alice", "hash", {'height': 170})
+    storage.append_food("alice", [{'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 95}])
+
+    def unmounted(path, mode="r", *args, **kwargs):
+        raise OSError("Drive unmounted")
+    monkeypatch.setattr(datamanager, "open", unmounted, raising=False)
+    with pytest.raises(OSError):
+        storage.flush()
+    monkeypatch.undo()
+    storage.flush()
+    storage.close()
+
+    reopened = datamanager.PickleBackend(data_file, background=False)
+    try:
+        assert reopened.get_food_log("alice")['Calories'].tolist() == [95]
+    finally:
+        reopened.close()
+
+def test_entries_are_pickled_outside_the_backend_lock(tmp_path, monkeypatch):
+    storage = datamanager.PickleBackend(str(tmp_path / "data.pkl"), background=False)
+    storage.register("alice", "hash", {'height': 170})
+    dumps, lock_free = datamanager.pickle.dumps, []
+
+    def checking_dumps(obj, *args, **kwargs):
+        # Another thread must be able to take `_lock` while an entry is being pickled.
+        probe = threading.Thread(target=lambda: lock_free.append(storage._lock.acquire(timeout=1)
+                                                                 and storage._lock.release() is None))
+        probe.start()
+        probe.join()
+        return dumps(obj, *args, **kwargs)
+    monkeypatch.setattr(datamanager.pickle, "dumps", checking_dumps)
+    storage.append_food("alice", [{'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 95}])
+    monkeypatch.undo()
+    storage.close()
+    assert lock_free and all(lock_free)
@@ -0,0 +1,20 @@
+import metrics
+
+
+def test_writes_count_bytes_toward_the_handler(storage, monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    metrics.reset()
+    storage.register("alice", "hash", {'height': 170})
+    add_food = metrics.handler("add_food")(
+        lambda: storage.append_food("alice", [{'Date': '2024-01-01', 'Food': 'Apple', 'Calories': 95}]))
+    upsert_bmi = metrics.handler("update_bmi")(
+        lambda: storage.upsert_bmi("alice", [{'Date': '2024-01-01', 'BMI': 24.2, 'Weight': 70.0, 'TDEE': 2500}]))
+    add_food()
+    upsert_bmi()
+    try:
+        table = metrics.handler_table().set_index('Handler')
+        assert table.loc['add_food', 'Avg Bytes'] > 0
+        assert table.loc['update_bmi', 'Avg Bytes'] > 0
+        assert table.loc['add_food', 'Avg Rows'] == 1
+    finally:
+        metrics.reset()
@@ -0,0 +1,89 @@
+import os
+import pickle
+import pandas as pd
+import pytest
+import datamanager
+
+PAGE = 7
+
+
+def _add_entries(storage, username, n):
+    for start in range(0, n, 10):
+        storage.append_food(username, [{'Date': f"2024-01-{1 + i // 5:02d}", 'Food': f"Food {i}", 'Calories': i}
+                                       for i in range(start, min(start + 10, n))])
+
+def test_food_log_pages_are_newest_first(storage):
+    for username in ("alice", "bob"):
+        storage.register(username, "hash", {'height': 170})
+    _add_entries(storage, "alice", 30)
+    _add_entries(storage, "bob", 5)
+
+    assert storage.food_log_size("alice") == 30
+    foods = []
+    for offset in range(0, 35, PAGE):
+        page = storage.get_food_log_page("alice", offset, PAGE)
+        assert len(page) == max(0, min(PAGE, 30 - offset))
+        foods.extend(page['Food'])
+    assert foods == [f"Food {i}" for i in reversed(range(30))]
+    for offset in (30, 35, 40):
+        assert storage.get_food_log_page("alice", offset, PAGE).empty
+    assert storage.get_food_log_page("bob", 0, PAGE)['Calories'].tolist() == [4, 3, 2, 1, 0]
+
+def test_sqlite_pages_use_the_entry_index(tmp_path):
+    storage = datamanager.SQLiteBackend(str(tmp_path / "data.sqlite3"))
+    try:
+        plan = storage._conn().execute(
+            f"EXPLAIN QUERY PLAN {storage.FOOD_LOG_QUERY} AND entry <= ? ORDER BY entry DESC LIMIT ?",
+            ("alice", 100, PAGE)).fetchall()
+        assert any("idx_food_log_user_entry" in row[-1] for row in plan)
+    finally:
+        storage.close()
+
+def test_interrupted_sqlite_migration_can_be_rerun(tmp_path, monkeypatch):
+    data_file, db_file = str(tmp_path / "data.pkl"), str(tmp_path / "data.sqlite3")
+    source = datamanager.PickleBackend(data_file, background=False)
+    for username in ("alice", "bob"):
+        source.register(username, "hash", {'height': 170})
+        _add_entries(source, username, 3)
+        source.upsert_bmi(username, [{'Date': '2024-01-01', 'BMI': 24.2, 'Weight': 70.0, 'TDEE': 2500}])
+    source.flush()
+    journal_size = os.path.getsize(datamanager._journal_path(data_file))
+
+    def crash(self, conn, username, rows):
+        raise RuntimeError("interrupted")
+    monkeypatch.setattr(datamanager.SQLiteBackend, "_insert_bmi", crash)
+    with pytest.raises(RuntimeError):
+        datamanager.migrate_pickle_to_sqlite(data_file, db_file)
+    monkeypatch.undo()
+    assert datamanager.migrate_pickle_to_sqlite(data_file, db_file) == 2
+
+    target = datamanager.SQLiteBackend(db_file)
+    try:
+        for username in ("alice", "bob"):
+            assert target.food_log_size(username) == 3
+            assert len(target.get_bmi_history(username)) == 1
+    finally:
+        target.close()
+        source.close()
+    # The source was only read.
+    assert os.path.getsize(datamanager._journal_path(data_file)) == journal_size
+
+def test_original_pickle_file_is_upgraded(tmp_path):
+    data_file = str(tmp_path / "data.pkl")
+    with open(data_file, "wb") as f:
+        pickle.dump({'alice': {
+            'password': "hash", 'profile': {'height': 170},
+            'food_log': pd.DataFrame({'Date': ['2024-01-01', '2024-01-02'], 'Food': ['Apple', 'Tea'],
+                                      'Calories': [95, 0]}),
+            'bmi_history': pd.DataFrame({'Date': ['2024-01-01'], 'BMI': [24.2], 'Weight': [70.0], 'TDEE': [2500]}),
+        }}, f)
+
+    storage = datamanager.PickleBackend(data_file, background=False)
+    try:
+        assert storage.get_password("alice") == "hash"
+        assert storage.get_food_log("alice")['Food'].tolist() == ['Apple', 'Tea']
+        assert storage.get_bmi_history("alice")['TDEE'].tolist() == [2500]
+    finally:
+        storage.close()
+    with open(data_file, "rb") as f:
+        assert f.read(len(datamanager.SNAPSHOT_MAGIC)) == datamanager.SNAPSHOT_MAGIC